@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+''' micro-benchmark of lyrics page parsing (lyrics/parse.py), no network needed
+
+    usage: python benchmarks/parse_pages.py [corpus directory] [repeat]
+
+    pages are synthetic google search results and azlyrics pages,
+    saved pages are used instead if a corpus directory is given,
+    files named google-*.html and azlyrics-*.html
+'''
+from pathlib import Path
+from statistics import median
+
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from lyrics import parse
+
+GOOGLE_CLASS = 'BNeawe tAd8D AP7Wnd'
+AZ_LINK = 'https://www.azlyrics.com/lyrics/artist/title.html'
+
+
+def verse(number, lines=8):
+    return '\n'.join(f'Line {i} of verse {number}, don&#39;t &amp; won&apos;t &quot;stop&quot;'
+                     for i in range(lines))
+
+
+def google_page(verses=6, filler=400):
+    ''' returns search result page with lyrics in divs, like google serves
+        to text browsers, padded with unrelated result markup
+    '''
+    results = ''.join(f'<div class="kCrYT"><a href="/url?q=https://example.com/{i}&amp;sa=U">'
+                      f'<span>Result {i}</span></a></div>' for i in range(filler))
+    lyrics = ''.join(f'<div class="{GOOGLE_CLASS}">{verse(i)}</div>' for i in range(verses))
+    link = f'<a href="/url?q={AZ_LINK}&amp;sa=U">azlyrics</a>'
+
+    return (f'<html><head><title>artist title lyrics</title></head><body>{results[:len(results) // 2]}'
+            f'<div class="{GOOGLE_CLASS}">Artist - Title</div>{lyrics}{link}'
+            f'{results[len(results) // 2:]}</body></html>')
+
+
+def az_page(verses=6, filler=400):
+    ''' returns azlyrics song page, lyrics between comment markers
+    '''
+    markup = ''.join(f'<div class="col"><a href="/{i}.html">Song {i}</a></div>' for i in range(filler))
+    lyrics = '<br>\n<br>\n'.join(verse(i).replace('\n', '<br>\r\n') for i in range(verses))
+
+    return (f'<html><body>{markup}<div class="ringtone"></div><b>"Title"</b><br><br><div>'
+            f'{parse.AZ_START}\r\n{lyrics}\r\n</div>{parse.AZ_END}{markup}</body></html>')
+
+
+def parse_google(page):
+    return parse.google_lyrics(page)
+
+
+def parse_az_url(page):
+    return parse.AZ_URL.search(page)
+
+
+def parse_az(page):
+    start = page.index(parse.AZ_START) + len(parse.AZ_START)
+    return parse.az_lyrics(page[start:page.index(parse.AZ_END, start)])
+
+
+def corpus(directory=None):
+    ''' returns list of (name, page, parser function)
+    '''
+    if directory is None:
+        page = google_page()
+        return [('google', page, parse_google),
+                ('google az link', page, parse_az_url),
+                ('azlyrics', az_page(), parse_az)]
+
+    pages = []
+    for path in sorted(Path(directory).glob('*.html')):
+        page = path.read_text(errors='replace')
+        if path.name.startswith('google'):
+            pages.append((path.name, page, parse_google))
+            pages.append((path.name + ' az link', page, parse_az_url))
+        elif path.name.startswith('azlyrics'):
+            pages.append((path.name, page, parse_az))
+
+    return pages
+
+
+def bench(function, page, repeat):
+    ''' returns list of seconds per call
+    '''
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(page)
+        times.append(time.perf_counter() - start)
+
+    return times
+
+
+def main():
+    directory = sys.argv[1] if len(sys.argv) > 1 else None
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+
+    print(f'{"page":<32} {"kB":>6} {"min us":>8} {"median us":>10}')
+    for name, page, function in corpus(directory):
+        result = function(page)
+        if result is None or isinstance(result, str):
+            print(f'{name:<32} not parsed: {result}')
+            continue
+
+        times = bench(function, page, repeat)
+        print(f'{name:<32} {len(page) / 1024:>6.1f} '
+              f'{min(times) * 1e6:>8.1f} {median(times) * 1e6:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -6,14 +6,48 @@ CONFIG_PATH = Path.home().joinpath('.config', 'lyrics-in-terminal','lyrics.cfg')
 
 __version__ = '1.5.1-dev'
 
-if not CONFIG_PATH.exists():
-    from shutil import copy
+
+
+def install_config():
+    ''' copies default config to CONFIG_PATH if it does not exist
+    '''
+    if not CONFIG_PATH.exists():
+        from shutil import copy
+        import os
+
+        dirname = Path(__file__).parent
+        src = dirname.joinpath('lyrics.cfg')
+
+        if not CONFIG_PATH.parent.exists():
+            os.makedirs(CONFIG_PATH.parent)
+
+        copy(src, CONFIG_PATH)
+
+
+def get_socket_path(create=False):
+    ''' returns path of lyrics daemon socket (lyrics --daemon)
+
+        socket is in XDG_RUNTIME_DIR, or in a directory of current user
+        (mode 0700) in temp dir, created if create is True
+
+        raises PermissionError if that directory belongs to another user
+    '''
     import os
 
-    dirname = Path(__file__).parent
-    src = dirname.joinpath('lyrics.cfg')
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime_dir:
+        return Path(runtime_dir).joinpath('lyrics-in-terminal.sock')
+
+    from stat import S_ISDIR
+    from tempfile import gettempdir
+
+    directory = Path(gettempdir()).joinpath(f'lyrics-in-terminal-{os.getuid()}')
+    if create:
+        os.makedirs(directory, mode=0o700, exist_ok=True)
 
-    if not CONFIG_PATH.parent.exists():
-        os.makedirs(CONFIG_PATH.parent)
+    if directory.exists():
+        info = os.lstat(directory)
+        if info.st_uid != os.getuid() or not S_ISDIR(info.st_mode) or info.st_mode & 0o077:
+            raise PermissionError(f'{directory} is not a private directory of current user!')
 
-    copy(src, CONFIG_PATH)
+    return directory.joinpath('lyrics-in-terminal.sock')
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from lyrics import util
+from lyrics.net import client
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from argparse import ArgumentParser
+import os
+import sys
+import time
+
+AUDIO_EXTENSIONS = ('.mp3', '.flac', '.ogg', '.opus', '.m4a', '.wav', '.wma', '.aac')
+
+MUTAGEN_ENABLED = False
+
+try:
+    # reading audio tags is optional, file names are used otherwise
+    import mutagen
+    MUTAGEN_ENABLED = True
+except ImportError:
+    pass
+
+
+def read_list(file):
+    ''' returns track names from lines in format "artist - title"
+    '''
+    return [line.strip() for line in file
+            if line.strip() != '' and not line.startswith('#')]
+
+
+def read_mpd(host, port, password):
+    ''' returns track names of all songs in mpd database
+    '''
+    from mpd import MPDClient
+
+    client = MPDClient()
+    client.connect(host, port)
+    if password != '':
+        client.password(password)
+
+    track_names = []
+    for song in client.listallinfo():
+        if 'artist' not in song or 'title' not in song:
+            continue
+
+        artist, title = song['artist'], song['title']
+        # multiple tag values are returned as list
+        artist = artist[0] if isinstance(artist, list) else artist
+        title = title[0] if isinstance(title, list) else title
+        track_names.append(f'{artist} - {title}')
+
+    client.disconnect()
+    return track_names
+
+
+def read_tags(filepath):
+    ''' returns track name of audio file from its tags,
+        or from file name in format "artist - title.ext"
+    '''
+    if MUTAGEN_ENABLED:
+        try:
+            tags = mutagen.File(filepath, easy=True)
+            if tags and 'artist' in tags and 'title' in tags:
+                return f"{tags['artist'][0]} - {tags['title'][0]}"
+        except Exception as e:
+            pass
+
+    name = os.path.splitext(os.path.basename(filepath))[0]
+    return name if ' - ' in name else None
+
+
+def read_directory(path):
+    ''' returns track names of audio files in directory (recursive)
+    '''
+    track_names = []
+    for root, _, files in os.walk(path):
+        for filename in files:
+            if filename.lower().endswith(AUDIO_EXTENSIONS):
+                track_name = read_tags(os.path.join(root, filename))
+                if track_name is not None:
+                    track_names.append(track_name)
+
+    return track_names
+
+
+def read_tracks(source, defaults):
+    ''' returns track names from source
+        source -> file path, '-' for stdin, 'mpd' or directory path
+    '''
+    if source == '-':
+        return read_list(sys.stdin)
+    elif source == 'mpd':
+        return read_mpd(defaults['mpd_host'] or '127.0.0.1',
+                        defaults['mpd_port'] or 6600, defaults['mpd_pass'] or '')
+    elif os.path.isdir(source):
+        return read_directory(source)
+
+    with open(source) as file:
+        return read_list(file)
+
+
+def fetch(track_name, source):
+    ''' fetches lyrics of track into cache, returns True if lyrics were found
+    '''
+    util.get_lyrics(track_name, source)
+    return util.is_cached(track_name)
+
+
+def run(track_names, source, workers):
+    ''' fetches lyrics of tracks not in cache yet, prints progress
+        returns (found, missing, skipped) counts
+    '''
+    # keep order, drop duplicates and tracks fetched in previous runs
+    track_names = list(dict.fromkeys(track_names))
+    pending = [t for t in track_names if not util.is_cached(t)]
+    skipped = len(track_names) - len(pending)
+
+    found = missing = 0
+    start = time.monotonic()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(fetch, t, source) for t in pending]
+
+        try:
+            for done, future in enumerate(as_completed(futures), 1):
+                try:
+                    lyrics_found = future.result()
+                except Exception as e:
+                    lyrics_found = False
+
+                found += lyrics_found
+                missing += not lyrics_found
+
+                rate = done / max(time.monotonic() - start, 1e-6)
+                print(f'\r[{done}/{len(pending)}] found {found}, missing {missing}, '
+                      f'{rate:.2f} tracks/s', end='', file=sys.stderr)
+        except KeyboardInterrupt:
+            # queued fetches are dropped, only running ones finish on shutdown
+            for future in futures:
+                future.cancel()
+            raise
+
+    elapsed = time.monotonic() - start
+    print(file=sys.stderr)
+    print(f'{len(pending)} tracks fetched in {elapsed:.1f}s '
+          f'({len(pending) / max(elapsed, 1e-6):.2f} tracks/s), '
+          f'found {found}, missing {missing}, already cached {skipped}',
+          file=sys.stderr)
+
+    return found, missing, skipped
+
+
+def main(args, defaults):
+    ''' batch mode, fetches lyrics of many tracks into cache
+    '''
+    parser = ArgumentParser(prog='lyrics --batch',
+                            description='Fetch lyrics of many tracks into cache. '
+                            'Tracks already cached are skipped, so an interrupted run can be resumed.')
+    parser.add_argument('tracks',
+                        help='file with "artist - title" lines, - for stdin, '
+                        'mpd for mpd database or directory of audio files')
+    parser.add_argument('-w', '--workers', type=int, default=4,
+                        help='number of concurrent fetches (default 4)')
+    parser.add_argument('-r', '--rate-limit', type=float, default=1.0,
+                        help='minimum seconds between requests to same host (default 1)')
+    parser.add_argument('-s', '--source', default=defaults['source'],
+                        help='lyrics provider to try first')
+    options = parser.parse_args(args)
+
+    client.rate_limit = options.rate_limit
+
+    try:
+        track_names = read_tracks(options.tracks, defaults)
+    except (OSError, ImportError) as e:
+        print(f'Cannot read tracks from {options.tracks}:', e)
+        exit(1)
+
+    try:
+        run(track_names, options.source, options.workers)
+    except KeyboardInterrupt:
+        print('\nInterrupted, run again to resume.', file=sys.stderr)
+        exit(1)
@@ -1,21 +1,126 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-from lyrics import CONFIG_PATH
+from lyrics import CONFIG_PATH, install_config
 from configparser import ConfigParser
 
-import curses
+from pathlib import Path
+import os
 
+# packaged config, provides defaults for options missing in user config
+DEFAULT_CONFIG_PATH = Path(__file__).parent.joinpath('lyrics.cfg')
+
+# names of curses key constants, curses is imported only if used
 KEYS={
-    'arrow_up': curses.KEY_UP,
-    'arrow_down': curses.KEY_DOWN,
-    'arrow_left': curses.KEY_LEFT,
-    'arrow_right': curses.KEY_RIGHT
+    'arrow_up': 'KEY_UP',
+    'arrow_down': 'KEY_DOWN',
+    'arrow_left': 'KEY_LEFT',
+    'arrow_right': 'KEY_RIGHT'
+}
+
+# expected values of options, invalid values fall back to packaged defaults
+TYPES = {
+    'alignment': ('left', 'center', 'right'),
+    'cache': ('files', 'sqlite'),
+    'interval': int,
+    'mpd_port': int,
+    'race_delay': int,
+    'prefetch': int,
+    'prefetch_workers': int,
+    'memory_cache': int,
+    'memory_layouts': int,
+    'miss_ttl': int,
+    'miss_ttl_max': int,
+    'sync_interval': int,
+    'step-size': int,
+    'autoswitch': bool,
+    'dashboard': bool,
+    'events': bool,
+    'race': bool,
+    'memory_stats': bool,
+    'statusbar': bool,
+    'sync': bool,
 }
 
+
+class ConfigFile:
+    ''' config file parsed once and shared by all Config sections
+        re-read only when modification time of file changes
+    '''
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.mtime = None
+        # incremented on every (re)load
+        self.version = 0
+
+        self.defaults = ConfigParser()
+        self.defaults.read(DEFAULT_CONFIG_PATH)
+        self.parser = None
+
+        self.reload()
+
+    def modified(self):
+        try:
+            return os.stat(self.filepath).st_mtime_ns
+        except OSError:
+            return None
+
+    def reload(self):
+        ''' re-reads config file if it has changed
+            returns True if config was re-read
+        '''
+        mtime = self.modified()
+        if self.parser is not None and mtime == self.mtime:
+            return False
+
+        parser = ConfigParser()
+        try:
+            parser.read([DEFAULT_CONFIG_PATH, self.filepath])
+        except Exception as e:
+            # use default config
+            parser = self.defaults
+
+        self.parser = parser
+        self.mtime = mtime
+        self.version += 1
+        return True
+
+    def validate(self, section, key, value):
+        ''' returns value if valid for key, else packaged default value
+        '''
+        expected = TYPES.get(key)
+
+        if expected is int:
+            valid = value.strip().lstrip('-').isdigit()
+        elif expected is bool:
+            valid = value.lower() in ConfigParser.BOOLEAN_STATES
+        elif expected is not None:
+            valid = value in expected
+        else:
+            valid = True
+
+        if not valid and self.defaults.has_option(section, key):
+            return self.defaults[section][key]
+        return value
+
+
+FILES = {}
+
+
+def get_config_file(filepath):
+    ''' returns shared parsed config file
+    '''
+    if filepath not in FILES:
+        install_config()
+        FILES[filepath] = ConfigFile(filepath)
+    return FILES[filepath]
+
+
 class Config:
     def __init__(self, section, config_path=CONFIG_PATH):
         self.dict = {}
 
+        self.file = get_config_file(config_path)
         self.filepath = config_path
         self.section = section
 
@@ -38,30 +143,40 @@ class Config:
         return [(k, v) for k,v in self.dict.items()]
     
     def getboolean(self, entry):
-        try:
-            config = ConfigParser()
-            config.read(self.filepath)
-            return config[self.section].getboolean(entry)
-        except Exception as e:
-            pass
+        ''' returns option as bool, None if missing or not a boolean
+        '''
+        value = self.raw.get(entry, '').lower()
+        return ConfigParser.BOOLEAN_STATES.get(value)
 
     def load(self):
-        try:
-            config = ConfigParser()
-            config.read(self.filepath)
-        except Exception as e:
-            pass
-            # use default config
+        self.version = self.file.version
 
-        conf = dict(config.items(self.section))
-        assert isinstance(conf, dict)
+        conf = {}
+        if self.file.parser.has_section(self.section):
+            for key, value in self.file.parser.items(self.section):
+                conf[key] = self.file.validate(self.section, key, value)
 
+        # unconverted values
+        self.raw = dict(conf)
         self.dict = conf
 
+    def reload(self):
+        ''' re-reads config if file has changed
+            returns True if values have changed
+        '''
+        self.file.reload()
+        if self.version == self.file.version:
+            return False
+
+        self.load()
+        self.set_constants()
+        return True
+
     def set_constants(self):
         for key, value in self.dict.items():
             if value in KEYS.keys():
-                self.dict[key] = KEYS[value]
+                import curses
+                self.dict[key] = getattr(curses, KEYS[value])
             else:
                 try:
                     value = int(value)
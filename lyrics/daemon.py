@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from lyrics import get_socket_path, providers, util
+from lyrics.store import get_memory
+from lyrics.track import Track
+
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+import selectors
+import socket
+import time
+
+# protocol, one json object per line in both directions
+#
+# {"cmd": "track"}    -> player, current track and playback position
+# {"cmd": "lyrics"}   -> lyrics lines of current track (lrc timestamps included)
+# {"cmd": "line"}     -> synced lyrics line at playback position
+# {"cmd": "fetch", "artist": "..", "title": "..", "source": ".."}
+#                     -> lyrics lines of any track
+# {"cmd": "refresh", "source": "..", "cache": true}
+#                     -> re-fetches lyrics of current track
+# {"cmd": "switch", "step": 1}
+#                     -> focuses next player (dashboard mode)
+#
+# replies are objects with "error" key if request failed
+
+
+class Daemon:
+    ''' follows player and serves its track and lyrics over unix socket,
+        so several clients (windows, status bars, scripts) share
+        one player, fetch pipeline and memory cache
+
+        player -> Player or PlayerGroup
+        interval -> seconds between player updates
+    '''
+
+    def __init__(self, player, path=None, interval=1.5, workers=4):
+        self.player = player
+        # resolved when listening, socket directory may have to be created
+        self.path = path
+        self.interval = interval
+        # incremented when track or its lyrics change
+        self.version = 0
+        self.next_update = 0
+
+        # fetches of other tracks ("fetch" command), (connection, future)
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.pending = []
+
+        self.selector = selectors.DefaultSelector()
+        # partial request lines per connection
+        self.buffers = {}
+
+    def listen(self):
+        self.path = str(self.path or get_socket_path(create=True))
+        if os.path.exists(self.path):
+            if connect(self.path) is not None:
+                raise OSError(f'Lyrics daemon is already running at {self.path}')
+            # left by a daemon that was killed
+            os.remove(self.path)
+
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self.path)
+        os.chmod(self.path, 0o600)
+        server.listen()
+        server.setblocking(False)
+        self.selector.register(server, selectors.EVENT_READ)
+
+        return server
+
+    def serve(self):
+        ''' runs until interrupted
+        '''
+        server = self.listen()
+        try:
+            while True:
+                for key, _ in self.selector.select(self.timeout()):
+                    if key.fileobj is server:
+                        self.accept(server)
+                    else:
+                        self.read(key.fileobj)
+
+                self.tick()
+                self.reply_fetched()
+        finally:
+            self.selector.close()
+            server.close()
+            os.remove(self.path)
+            self.executor.shutdown(wait=False)
+
+    def timeout(self):
+        ''' returns seconds to wait for requests before next player update
+        '''
+        if self.pending or self.player.fetching:
+            return 0.1
+        return max(self.next_update - time.monotonic(), 0)
+
+    def tick(self):
+        ''' updates player every interval, swaps in fetched lyrics
+        '''
+        if time.monotonic() >= self.next_update:
+            self.next_update = time.monotonic() + self.interval
+            if self.player.update():
+                self.version += 1
+
+        if self.player.check_lyrics():
+            self.version += 1
+
+    def accept(self, server):
+        connection, _ = server.accept()
+        # requests are read when selector reports data, replies are small
+        connection.settimeout(1)
+        self.buffers[connection] = b''
+        self.selector.register(connection, selectors.EVENT_READ)
+
+    def close(self, connection):
+        self.selector.unregister(connection)
+        self.buffers.pop(connection, None)
+        connection.close()
+
+    def read(self, connection):
+        try:
+            data = connection.recv(4096)
+        except OSError:
+            data = b''
+        if not data:
+            self.close(connection)
+            return
+
+        self.buffers[connection] += data
+        *lines, self.buffers[connection] = self.buffers[connection].split(b'\n')
+        for line in lines:
+            if line.strip():
+                self.handle(connection, line)
+
+    def send(self, connection, reply):
+        try:
+            connection.sendall(json.dumps(reply).encode() + b'\n')
+        except OSError:
+            if connection in self.buffers:
+                self.close(connection)
+
+    def handle(self, connection, line):
+        try:
+            request = json.loads(line)
+            command = request['cmd']
+        except (ValueError, KeyError, TypeError):
+            self.send(connection, {'error': 'Invalid request!'})
+            return
+
+        if command == 'fetch':
+            self.fetch(connection, request)
+            return
+
+        handler = getattr(self, 'cmd_' + str(command), None)
+        if handler is None:
+            self.send(connection, {'error': f'Unknown command {command}!'})
+            return
+
+        try:
+            reply = handler(request)
+        except Exception as e:
+            # bad request must not stop daemon shared by all clients
+            reply = {'error': f'{command} failed: {e}'}
+        self.send(connection, reply)
+
+    def cmd_track(self, request):
+        track = self.player.track
+        return {
+            'version': self.version,
+            'running': self.player.running,
+            'player': self.player.player_name,
+            'artist': track.artist,
+            'title': track.title,
+            'album': track.album,
+            'trackid': track.trackid,
+            'source': track.source,
+            'fetching': self.player.fetching,
+            'playing': self.player.playing,
+            'position': self.player.position() if self.player.running else None
+        }
+
+    def cmd_lyrics(self, request):
+        track = self.player.track
+        return {
+            'version': self.version,
+            'lyrics': track.raw_lyrics or [],
+            'synced': track.synced
+        }
+
+    def cmd_line(self, request):
+        track = self.player.track
+        position = self.player.position() if self.player.running else None
+        line = -1
+        if position is not None and track.synced:
+            line = track.line_at(position)
+
+        return {
+            'line': line,
+            'text': track.lyrics[line] if line >= 0 else None,
+            'position': position
+        }
+
+    def cmd_refresh(self, request):
+        source = request.get('source')
+        if source is not None and not providers.is_source(source):
+            return {'error': f'Unknown source {source}!'}
+
+        if self.player.running:
+            # lyrics may have been edited by a client, memory copy is stale
+            get_memory().invalidate(self.player.track.track_name)
+            self.player.refresh(source, request.get('cache', True))
+            self.version += 1
+
+        return {'version': self.version}
+
+    def cmd_switch(self, request):
+        step = request.get('step', 1)
+        if not isinstance(step, int) or isinstance(step, bool):
+            return {'error': 'Step must be an integer!'}
+
+        switched = self.player.switch(step)
+        if switched:
+            self.version += 1
+
+        return {'switched': switched, 'version': self.version}
+
+    def fetch(self, connection, request):
+        ''' fetches lyrics of any track in background, replied when done
+        '''
+        try:
+            track_name = f"{request['artist']} - {request['title']}"
+        except KeyError:
+            self.send(connection, {'error': 'Missing artist or title!'})
+            return
+
+        source = request.get('source') or self.player.default_source
+        if not providers.is_source(source):
+            self.send(connection, {'error': f'Unknown source {source}!'})
+            return
+
+        future = self.executor.submit(util.get_lyrics, track_name, source,
+                                      cache=request.get('cache', True))
+        self.pending.append((connection, future))
+
+    def reply_fetched(self):
+        for connection, future in [p for p in self.pending if p[1].done()]:
+            self.pending.remove((connection, future))
+            try:
+                self.send(connection, {'lyrics': future.result()})
+            except Exception as e:
+                self.send(connection, {'error': str(e)})
+
+
+class Client:
+    ''' connection to lyrics daemon
+    '''
+
+    def __init__(self, path, timeout=30):
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.socket.settimeout(timeout)
+        self.socket.connect(str(path))
+        self.file = self.socket.makefile('rwb')
+
+    def request(self, command, **args):
+        ''' sends command, returns reply object
+
+            raises OSError if daemon is not reachable
+            raises ValueError if daemon replied with error
+        '''
+        self.file.write(json.dumps({'cmd': command, **args}).encode() + b'\n')
+        self.file.flush()
+
+        line = self.file.readline()
+        if not line:
+            raise ConnectionError('Lyrics daemon closed connection!')
+
+        reply = json.loads(line)
+        if 'error' in reply:
+            raise ValueError(reply['error'])
+
+        return reply
+
+    def close(self):
+        self.file.close()
+        self.socket.close()
+
+
+def connect(path=None):
+    ''' returns Client connected to daemon, None if daemon is not running
+        or socket does not belong to current user
+    '''
+    try:
+        path = str(path or get_socket_path())
+        if os.stat(path).st_uid != os.getuid():
+            return None
+
+        return Client(path)
+    except OSError:
+        return None
+
+
+class RemotePlayer:
+    ''' player interface for Window, track and lyrics are read from daemon
+
+        playback position is read with track state every update
+        and interpolated in between, like Player does
+    '''
+
+    def __init__(self, client, source, align=1):
+        self.client = client
+        self.default_source = source
+        # player switching is done by daemon
+        self.autoswitch = False
+
+        self.player_name = 'lyrics daemon'
+        self.running = False
+        self.fetching = False
+        self.playing = False
+        self.track = Track(align=align)
+
+        self.state = None
+        self.lyrics_version = None
+        self.position_base = None
+        self.position_at = 0
+        self.update()
+
+    def request(self, command, **args):
+        try:
+            return self.client.request(command, **args)
+        except (OSError, ValueError):
+            self.running = False
+            return None
+
+    def update(self):
+        ''' reads track state from daemon, returns True if track has changed
+        '''
+        state = self.request('track')
+        if state is None:
+            return False
+
+        self.running = state['running']
+        self.player_name = state['player']
+        self.fetching = state['fetching']
+        self.playing = state['playing']
+        self.position_base = state['position']
+        self.position_at = time.monotonic()
+
+        previous, self.state = self.state, state
+        if not self.running or state['title'] is None:
+            return False
+
+        changed = previous is None or any(previous[k] != state[k]
+                                          for k in ('player', 'artist', 'title', 'trackid'))
+        if changed:
+            self.track.update(state['artist'], state['title'], state['album'], state['trackid'])
+            self.check_lyrics()
+
+        return changed
+
+    def check_lyrics(self):
+        ''' reads lyrics from daemon if they have changed
+            returns True if lyrics of current track have arrived
+        '''
+        if self.state is None or self.state['version'] == self.lyrics_version:
+            return False
+
+        reply = self.request('lyrics')
+        if reply is None:
+            return False
+
+        self.lyrics_version = self.state['version']
+        self.track.source = self.state['source']
+        self.track.set_lyrics(reply['lyrics'] or ['lyrics not found! :('])
+        return True
+
+    def refresh(self, source=None, cache=True):
+        reply = self.request('refresh', source=source or self.default_source, cache=cache)
+        if reply is not None:
+            self.update()
+            self.check_lyrics()
+
+    def switch(self, step=1):
+        reply = self.request('switch', step=step)
+        if reply is None or not reply['switched']:
+            return False
+
+        self.update()
+        self.check_lyrics()
+        return True
+
+    def set_alignment(self, alignment):
+        self.track.alignment = alignment
+        if self.track.lyrics is not None:
+            self.track.reset_width()
+
+    def fds(self):
+        # daemon is polled every update
+        return []
+
+    def position(self):
+        if self.position_base is None:
+            return None
+        if not self.playing:
+            return self.position_base
+
+        return self.position_base + time.monotonic() - self.position_at
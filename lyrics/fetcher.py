@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from lyrics import util
+
+from concurrent.futures import Future
+from threading import Lock, Thread
+from queue import Queue
+
+
+class DaemonExecutor:
+    ''' thread pool like ThreadPoolExecutor, with daemon threads
+        so quitting does not wait for running fetches (timeouts, retries)
+
+        threads are started on demand, up to max_workers
+    '''
+
+    def __init__(self, max_workers):
+        self.max_workers = max_workers
+        self.workers = 0
+        self.queue = Queue()
+
+    def submit(self, fn, *args, **kwargs):
+        ''' returns concurrent.futures.Future of fn(*args, **kwargs)
+        '''
+        future = Future()
+        self.queue.put((future, fn, args, kwargs))
+
+        if self.workers < self.max_workers:
+            self.workers += 1
+            Thread(target=self.work, daemon=True).start()
+
+        return future
+
+    def work(self):
+        while True:
+            future, fn, args, kwargs = self.queue.get()
+            if not future.set_running_or_notify_cancel():
+                # cancelled while queued
+                continue
+
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+
+
+class Fetcher:
+    ''' fetches lyrics off the ui thread
+
+        only the latest submitted fetch is kept, results of
+        fetches for tracks that were skipped are dropped
+    '''
+
+    def __init__(self, workers=2, prefetch_workers=2, race_delay=None):
+        self.executor = DaemonExecutor(max_workers=workers)
+        # seconds before hedged request, None to fetch sources one by one
+        self.race_delay = race_delay
+        self.future = None
+        self.track_name = None
+
+        # prefetch_workers caps concurrent requests for upcoming tracks
+        self.prefetch_executor = DaemonExecutor(max_workers=prefetch_workers)
+        self.prefetching = set()
+        self.lock = Lock()
+
+    @property
+    def busy(self):
+        ''' returns True if a fetch is pending
+        '''
+        return self.future is not None
+
+    def submit(self, track_name, source, cache=True):
+        ''' starts fetching lyrics of track_name in background
+            cancels any pending fetch of previous track
+        '''
+        self.cancel()
+        self.track_name = track_name
+        self.future = self.executor.submit(
+            util.get_lyrics, track_name, source, cache=cache,
+            race_delay=self.race_delay)
+
+    def cancel(self):
+        ''' cancels pending fetch, if already running its result is dropped
+        '''
+        if self.future is not None:
+            self.future.cancel()
+
+        self.future = None
+        self.track_name = None
+
+    def result(self, track_name):
+        ''' returns list of lyrics lines if fetch for track_name is done
+            returns None if still fetching or result is stale
+        '''
+        if self.future is None or not self.future.done():
+            return None
+
+        future, name = self.future, self.track_name
+        self.future = None
+        self.track_name = None
+
+        if name != track_name:
+            # track has changed since, drop result
+            return None
+
+        try:
+            return future.result()
+        except Exception as e:
+            return ['lyrics not found! :(', 'Issue is:', str(e)]
+
+    def prefetch(self, track_names, source):
+        ''' fetches lyrics of upcoming tracks into cache in background
+            track_names -> list of track names in format "artist - title"
+        '''
+        for track_name in track_names:
+            with self.lock:
+                if track_name in self.prefetching:
+                    continue
+                self.prefetching.add(track_name)
+
+            self.prefetch_executor.submit(self.prefetch_track, track_name, source)
+
+    def prefetch_track(self, track_name, source):
+        ''' fetches lyrics of a single track into cache, unless already cached
+        '''
+        try:
+            if not util.is_cached(track_name):
+                util.get_lyrics(track_name, source, race_delay=self.race_delay)
+        except Exception:
+            # prefetch is best effort
+            pass
+        finally:
+            with self.lock:
+                self.prefetching.discard(track_name)
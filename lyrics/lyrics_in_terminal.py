@@ -3,15 +3,18 @@
 
 
 from lyrics.config import Config
-from lyrics.player import Player
-from lyrics.window import Window
+from lyrics.store import set_backend, set_memory, set_misses
 
 import sys
-import curses
+
+# modules are imported by the mode using them,
+# "-t" and "--batch" do not load curses, dbus or mpd
 
 
 def ErrorHandler(func):
     def wrapper(*args, **kwargs):
+        import curses
+
         try:
             curses.wrapper(func)
         except KeyboardInterrupt:
@@ -24,40 +27,137 @@ def ErrorHandler(func):
     return wrapper
 
 
-@ErrorHandler
-def init_pager(stdscr):
-    defaults = Config('OPTIONS')
+def configure(defaults):
+    ''' sets up lyrics cache and providers from config options
+    '''
+    set_backend(defaults['cache'])
+    set_memory(defaults['memory_cache'], defaults['memory_layouts'],
+               defaults.getboolean('memory_stats'))
+    set_misses(defaults['miss_ttl'], defaults['miss_ttl_max'])
 
-    if len(sys.argv) >= 2:
-        player_name = sys.argv[1].strip()
-        autoswitch = False
+    if defaults['local_path']:
+        from lyrics.providers import register, LocalProvider
+        register(LocalProvider(defaults['local_path']))
 
-    else:
-        player_name = defaults['player'].strip()
-        autoswitch = defaults.getboolean('autoswitch')
 
+def get_alignment(defaults):
     align = defaults['alignment']
 
     if align == 'center':
-        align = 0
+        return 0
     elif align == 'right':
-        align = 2
+        return 2
+    return 1
+
+
+def make_player(defaults, player_name=None):
+    ''' returns Player (PlayerGroup in dashboard mode) from config options
+        player_name -> follow only this player, no autoswitch
+    '''
+    from lyrics.player import Player, PlayerGroup
+
+    dashboard = player_name is None and defaults.getboolean('dashboard')
+    if player_name is not None:
+        autoswitch = False
     else:
-        align = 1
+        player_name = defaults['player'].strip()
+        autoswitch = defaults.getboolean('autoswitch')
 
-    interval = defaults['interval']
     source = defaults['source']
     mpd_connect = [defaults['mpd_host'],
                    defaults['mpd_port'], defaults['mpd_pass']]
 
-    player = Player(player_name, source, autoswitch, mpd_connect, align=align)
-    win = Window(stdscr, player, timeout=interval)
+    events = defaults.getboolean('events')
+    prefetch = defaults['prefetch']
+    prefetch_workers = defaults['prefetch_workers']
+
+    race_delay = None
+    if defaults.getboolean('race'):
+        race_delay = defaults['race_delay'] / 1000
+
+    options = dict(events=events, prefetch=prefetch,
+                   prefetch_workers=prefetch_workers,
+                   race_delay=race_delay,
+                   sync_interval=defaults['sync_interval'] / 1000,
+                   align=get_alignment(defaults))
+
+    if dashboard:
+        return PlayerGroup(source, autoswitch, mpd_connect, **options)
+    return Player(player_name, source, autoswitch, mpd_connect, **options)
+
+
+@ErrorHandler
+def init_pager(stdscr):
+    from lyrics.window import Window
+
+    defaults = Config('OPTIONS')
+    configure(defaults)
+
+    if len(sys.argv) >= 2:
+        player = make_player(defaults, sys.argv[1].strip())
+    else:
+        # thin client of daemon if it is running
+        from lyrics.daemon import connect, RemotePlayer
+
+        client = connect()
+        if client is not None:
+            player = RemotePlayer(client, defaults['source'], align=get_alignment(defaults))
+        else:
+            player = make_player(defaults)
+
+    win = Window(stdscr, player, timeout=defaults['interval'])
 
     win.main()
 
 
+def run_daemon():
+    from lyrics.daemon import Daemon
+
+    defaults = Config('OPTIONS')
+    configure(defaults)
+
+    daemon = Daemon(make_player(defaults), interval=defaults['interval'] / 1000)
+    try:
+        daemon.serve()
+    except OSError as e:
+        print(e)
+        exit(1)
+    except KeyboardInterrupt:
+        pass
+
+
+def fetch_remote(artist, title, source):
+    ''' returns lyrics lines fetched by daemon, None if daemon is not running
+    '''
+    from lyrics.daemon import connect
+
+    client = connect()
+    if client is None:
+        return None
+
+    try:
+        return client.request('fetch', artist=artist, title=title, source=source)['lyrics']
+    except (OSError, ValueError):
+        return None
+    finally:
+        client.close()
+
+
 def main():
     if len(sys.argv) >= 2:
+        if sys.argv[1] == '--batch':
+            from lyrics.batch import main as batch
+
+            defaults = Config('OPTIONS')
+            configure(defaults)
+            batch(sys.argv[2:], defaults)
+
+            exit(0)
+
+        if sys.argv[1] == '--daemon':
+            run_daemon()
+            exit(0)
+
         if sys.argv[1] == '-t':
             try:
                 artist = sys.argv[2].strip()
@@ -69,8 +169,16 @@ def main():
 
             from lyrics.track import Track
 
+            defaults = Config('OPTIONS')
+            configure(defaults)
+
             track = Track(artist=artist, title=title)
-            track.get_lyrics('google')
+            lyrics = fetch_remote(artist, title, defaults['source'])
+            if lyrics is not None:
+                track.source = defaults['source']
+                track.set_lyrics(lyrics)
+            else:
+                track.get_lyrics(defaults['source'])
 
             print(track.track_name)
             print('-' * track.width, '\n')
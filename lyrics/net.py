@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from http.client import HTTPConnection, HTTPSConnection, HTTPException
+from urllib.parse import urljoin, urlsplit
+from threading import Lock
+
+import codecs
+import gzip
+import re
+import time
+import zlib
+
+BROTLI_ENABLED = False
+
+try:
+    # brotli is optional, gzip/deflate are always accepted
+    import brotli
+    BROTLI_ENABLED = True
+except ImportError:
+    pass
+
+
+# error of failed connection, lyrics may still exist
+OFFLINE = 'Cannot connect to internet!'
+
+INVALID_RESPONSE = 'Invalid response {}!'
+
+
+class FetchError(Exception):
+    ''' raised when a page cannot be fetched
+    '''
+
+
+def transient(error):
+    ''' returns True if error string is of a failure that may pass
+        (offline, rate limited, server error), lyrics may still exist
+    '''
+    if error == OFFLINE:
+        return True
+
+    match = re.fullmatch(INVALID_RESPONSE.format(r'(\d+)'), error)
+    if match is None:
+        return False
+
+    status = int(match.group(1))
+    return status == 429 or status >= 500
+
+
+class HTTPClient:
+    ''' http client keeping connections alive per host
+
+        connect_timeout, read_timeout -> seconds
+        retries -> number of retries on connection errors and 5xx responses
+        backoff -> seconds to wait before first retry, doubled on every retry
+        pool_size -> idle connections kept per host
+        rate_limit -> minimum seconds between requests to same host
+    '''
+
+    def __init__(self, connect_timeout=5, read_timeout=10, retries=2,
+                 backoff=0.5, pool_size=4, rate_limit=0):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+        self.rate_limit = rate_limit
+
+        # (scheme, host) -> idle connections
+        self.pools = {}
+        # host -> earliest time of next request
+        self.next_request = {}
+        self.lock = Lock()
+
+        encodings = ['gzip', 'deflate']
+        if BROTLI_ENABLED:
+            encodings.append('br')
+        self.accept_encoding = ', '.join(encodings)
+
+    def throttle(self, host):
+        ''' waits until next request to host is allowed by rate_limit
+        '''
+        if self.rate_limit <= 0:
+            return
+
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_request.get(host, 0))
+            self.next_request[host] = start + self.rate_limit
+
+        time.sleep(start - now)
+
+    def connect(self, scheme, host, fresh=False):
+        ''' returns (connection, reused), idle connection to host is reused,
+            a new one is opened if none is idle or fresh is True
+        '''
+        if not fresh:
+            with self.lock:
+                pool = self.pools.get((scheme, host))
+                if pool:
+                    return pool.pop(), True
+
+        connection_type = HTTPSConnection if scheme == 'https' else HTTPConnection
+        connection = connection_type(host, timeout=self.connect_timeout)
+        connection.connect()
+        connection.sock.settimeout(self.read_timeout)
+
+        return connection, False
+
+    def release(self, scheme, host, connection):
+        ''' returns connection to pool of host to be reused
+        '''
+        with self.lock:
+            pool = self.pools.setdefault((scheme, host), [])
+            if len(pool) < self.pool_size:
+                pool.append(connection)
+                return
+
+        connection.close()
+
+    def request(self, url, headers):
+        ''' sends GET request, follows redirects
+            returns (response, connection, scheme, host)
+
+            raises OSError or HTTPException on connection errors
+        '''
+        for _ in range(5):
+            parts = urlsplit(url)
+            path = parts.path or '/'
+            if parts.query:
+                path += '?' + parts.query
+
+            self.throttle(parts.netloc)
+            connection, reused = self.connect(parts.scheme, parts.netloc)
+            try:
+                response = self.send(connection, path, headers)
+            except (OSError, HTTPException):
+                connection.close()
+                if not reused:
+                    raise
+                # idle connection was closed by server, nothing was read yet
+                connection, _ = self.connect(parts.scheme, parts.netloc, fresh=True)
+                try:
+                    response = self.send(connection, path, headers)
+                except (OSError, HTTPException):
+                    connection.close()
+                    raise
+
+            if response.status in (301, 302, 303, 307, 308):
+                response.read()
+                self.finish(parts.scheme, parts.netloc, connection, response)
+                url = urljoin(url, response.getheader('Location'))
+                continue
+
+            return response, connection, parts.scheme, parts.netloc
+
+        raise FetchError('Too many redirects!')
+
+    def send(self, connection, path, headers):
+        ''' sends GET request on connection, returns response
+        '''
+        connection.request('GET', path, headers={
+            **headers,
+            'Accept-Encoding': self.accept_encoding,
+            'Connection': 'keep-alive'
+        })
+        return connection.getresponse()
+
+    def finish(self, scheme, host, connection, response):
+        ''' releases connection after response was read completely
+        '''
+        if response.will_close:
+            connection.close()
+        else:
+            self.release(scheme, host, connection)
+
+    def decode(self, response, body):
+        ''' returns decompressed and decoded response body
+        '''
+        encoding = response.getheader('Content-Encoding', '').lower()
+        if encoding == 'gzip':
+            body = gzip.decompress(body)
+        elif encoding == 'deflate':
+            body = zlib.decompress(body)
+        elif encoding == 'br':
+            body = brotli.decompress(body)
+
+        charset = response.headers.get_content_charset() or 'utf-8'
+        return body.decode(charset, errors='replace')
+
+    def decompressor(self, response):
+        ''' returns function decompressing response body chunk by chunk
+        '''
+        encoding = response.getheader('Content-Encoding', '').lower()
+        if encoding == 'gzip':
+            return zlib.decompressobj(16 + zlib.MAX_WBITS).decompress
+        elif encoding == 'deflate':
+            return zlib.decompressobj().decompress
+        elif encoding == 'br':
+            return brotli.Decompressor().process
+
+        return lambda chunk: chunk
+
+    def stream(self, url, headers, chunk_size=16384):
+        ''' yields text of page at url in decoded chunks
+
+            request is retried like in get(), until first chunk is read
+            if generator is closed before page was read completely,
+            connection is closed instead of being reused
+
+            raises FetchError if page cannot be fetched
+        '''
+        for attempt in range(self.retries + 1):
+            if attempt > 0:
+                time.sleep(self.backoff * 2 ** (attempt - 1))
+
+            try:
+                response, connection, scheme, host = self.request(url, headers)
+            except (OSError, HTTPException):
+                error = FetchError(OFFLINE)
+                continue
+
+            if response.status == 200:
+                break
+
+            connection.close()
+            error = FetchError(INVALID_RESPONSE.format(response.status))
+            if response.status < 500 and response.status != 429:
+                # client errors are not retried
+                raise error
+        else:
+            raise error
+
+        decompress = self.decompressor(response)
+        charset = response.headers.get_content_charset() or 'utf-8'
+        decoder = codecs.getincrementaldecoder(charset)(errors='replace')
+
+        try:
+            while True:
+                chunk = response.read1(chunk_size)
+                if not chunk:
+                    break
+                yield decoder.decode(decompress(chunk))
+        except (OSError, HTTPException, zlib.error):
+            connection.close()
+            raise FetchError(OFFLINE)
+        except GeneratorExit:
+            # stopped early, rest of response is not read
+            connection.close()
+            raise
+
+        self.finish(scheme, host, connection, response)
+
+    def get(self, url, headers):
+        ''' returns text of page at url
+
+            raises FetchError if page cannot be fetched
+        '''
+        for attempt in range(self.retries + 1):
+            if attempt > 0:
+                time.sleep(self.backoff * 2 ** (attempt - 1))
+
+            try:
+                response, connection, scheme, host = self.request(url, headers)
+            except (OSError, HTTPException):
+                error = FetchError(OFFLINE)
+                continue
+
+            try:
+                body = response.read()
+            except (OSError, HTTPException):
+                connection.close()
+                error = FetchError(OFFLINE)
+                continue
+
+            self.finish(scheme, host, connection, response)
+
+            if response.status == 200:
+                return self.decode(response, body)
+
+            error = FetchError(INVALID_RESPONSE.format(response.status))
+            if response.status < 500 and response.status != 429:
+                # client errors are not retried
+                break
+
+        raise error
+
+
+client = HTTPClient()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from html import unescape
+
+import re
+
+# patterns are compiled once, at import
+BRACKETS = re.compile(r'(\[.*\].*)|(\(.*\).*)')
+KEY_CHARS = re.compile(r'\s|\/|\\|\.')
+TAGS = re.compile(r'<[/]?\w*?>')
+
+CLASS_NAME = r'\w{5,7} \w{4,5} \w{5,7}'  # dependent on User-Agent
+GOOGLE_LYRICS = re.compile(r'<div class="{}">([^>]*?)</div>'.format(CLASS_NAME), re.S)
+
+AZ_URL = re.compile(r'(http[s]?://www.azlyrics.com/lyrics(?:.*?))&amp')
+# markers around lyrics in azlyrics page
+AZ_START = '<!-- Usage of azlyrics.com content by any third-party lyrics provider is prohibited by our licensing agreement. Sorry about that. -->'
+AZ_END = '<!-- MxM banner -->'
+
+# timestamps [mm:ss], [mm:ss.xx] of synced (lrc) lyrics
+LRC_TIME = re.compile(r'\[(\d+):(\d{1,2}(?:[.:]\d{1,3})?)\]')
+# id tags [ar:artist], [offset:+100]
+LRC_TAG = re.compile(r'^\[(\w+):(.*)\]$')
+
+
+def strip_brackets(track_name):
+    ''' removes text in brackets [] () from track name
+    '''
+    return BRACKETS.sub('', track_name).strip()
+
+
+def cache_key(track_name):
+    ''' returns cache key (file name) of track name
+    '''
+    return KEY_CHARS.sub('', strip_brackets(track_name))
+
+
+def google_lyrics(html):
+    ''' returns list of lyrics lines in google search result html
+        returns error string if lyrics not found or too short
+    '''
+    text_list = GOOGLE_LYRICS.findall(html)
+
+    if len(text_list) < 2:
+        return 'No google result found!'
+
+    ly = []
+    for l in text_list[1:]:
+        # lyrics must be multiline,
+        # ignore the artist info below lyrics
+        if l.count('\n') > 2:
+            ly += l.split('\n')
+    if len(ly) < 5:
+        return 'Google lyrics too short...'
+
+    # html entities are decoded in one pass
+    return unescape('\n'.join(ly)).split('\n')
+
+
+def az_lyrics(block):
+    ''' returns list of lyrics lines from lyrics block of azlyrics page
+    '''
+    ly = TAGS.sub('', block).replace('\r', '').strip()
+    return unescape(ly).split('\n')
+
+
+def lrc(lines):
+    ''' returns (text, times, rows) of synced lyrics in lrc format
+        returns None if lines have no timestamps
+
+        text -> lyrics lines without timestamps and id tags
+        times -> sorted list of timestamps in seconds
+        rows -> index of line in text for every timestamp
+    '''
+    text, times, rows = [], [], []
+    offset = 0
+
+    for line in lines:
+        stamps = []
+        position = 0
+        match = LRC_TIME.match(line, position)
+        while match:
+            minutes, seconds = match.groups()
+            stamps.append(int(minutes) * 60 + float(seconds.replace(':', '.')))
+            position = match.end()
+            match = LRC_TIME.match(line, position)
+
+        if len(stamps) == 0:
+            tag = LRC_TAG.match(line.strip())
+            if tag:
+                if tag.group(1).lower() == 'offset':
+                    # milliseconds, positive offset shows lines sooner
+                    try:
+                        offset = int(tag.group(2)) / 1000
+                    except ValueError:
+                        pass
+                continue
+
+        # repeated lines (chorus) have several timestamps
+        for stamp in stamps:
+            times.append(stamp)
+            rows.append(len(text))
+        text.append(line[position:].strip() if stamps else line)
+
+    if len(times) == 0:
+        return None
+
+    order = sorted(range(len(times)), key=times.__getitem__)
+    times = [times[i] - offset for i in order]
+    rows = [rows[i] for i in order]
+
+    return text, times, rows
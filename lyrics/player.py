@@ -1,46 +1,224 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 from lyrics.track import Track
+from lyrics.fetcher import Fetcher
+from lyrics import util
+
+from select import select
+from importlib.util import find_spec
 
 import dbus
 import re
+import time
+
+# making mpd an optional dependency, imported on first connect
+MPD_ENABLED = find_spec('mpd') is not None
+
+# seconds to wait before reconnecting to mpd
+MPD_MIN_BACKOFF = 1
+MPD_MAX_BACKOFF = 60
+
+# PropertiesChanged signals need a glib main loop (PyGObject)
+EVENTS_ENABLED = find_spec('gi') is not None
+
+MPRIS_NAME = re.compile(r'org.mpris.MediaPlayer2|plasma-browser-integration', re.IGNORECASE)
+MPRIS_PLAYER = 'org.mpris.MediaPlayer2.Player'
+
+# seconds between listing bus names for mpris players,
+# in event mode the list is kept up to date with NameOwnerChanged signals
+PLAYERS_INTERVAL = 10
 
-MPD_ENABLED = False
 
-try:
-    # making mpd an optional dependency
-    from mpd import MPDClient as mpd
-    MPD_ENABLED = True
-except ImportError:
-    pass
+def use_glib_mainloop():
+    ''' makes glib main loop default for dbus connections, returns glib main context
+
+        must be called before first dbus.SessionBus(), shared bus keeps
+        main loop it was created with and never dispatches signals without one
+    '''
+
+    from dbus.mainloop.glib import DBusGMainLoop
+    from gi.repository import GLib
+
+    DBusGMainLoop(set_as_default=True)
+    return GLib.MainContext.default()
 
 
 class Player:
-    def __init__(self, name, source, autoswitch, mpd_connect, **kwargs):
+    def __init__(self, name, source, autoswitch, mpd_connect, events=False,
+                 prefetch=0, prefetch_workers=2, race_delay=None,
+                 sync_interval=5, mpd=True, mpris=True, **kwargs):
         self.player_name = name
         self.default_source = source
 
         self.autoswitch = autoswitch
 
+        # properties interfaces of mpris players on session bus, by service name
+        self.proxies = {}
+        self.players_listed = None
+
+        # mpd only player (dashboard mode), mpris players are not looked up
+        self.mpris = mpris
+
+        # event mode, player state is re-read only when it signals a change
+        self.events = events and EVENTS_ENABLED and mpris
+        self.changed = True
+        # signal receivers, removed when player is closed
+        self.receivers = []
+        if self.events:
+            self.subscribe()
+
         self.running = False
         self.track = Track(**kwargs)
+        self.fetcher = Fetcher(prefetch_workers=prefetch_workers,
+                               race_delay=race_delay)
+        # number of upcoming tracks to prefetch lyrics for
+        self.prefetch_count = prefetch
+
+        # playback position for synced lyrics, read from mpris player every
+        # sync_interval seconds (from mpd on every player change) and
+        # interpolated with monotonic clock in between
+        self.sync_interval = sync_interval
+        self.position_base = 0
+        self.position_at = None
+        self.position_due = 0
+        self.playing = False
 
         self.player_interface = None
         self.mpd_host = mpd_connect[0] or '127.0.0.1'
         self.mpd_port = mpd_connect[1] or 6600
         self.mpd_pass = mpd_connect[2] or ''
 
-        self.mpd_enabled = MPD_ENABLED
+        # mpd is followed when no mpris player is running
+        self.mpd_enabled = mpd and MPD_ENABLED
+        # single mpd connection, track changes are read with "idle player"
+        self.mpd_client = None
+        self.mpd_idling = False
+        self.mpd_playing = False
+        self.mpd_backoff = MPD_MIN_BACKOFF
+        self.mpd_retry_at = 0
         self.update()
 
-    def check_playing(self):
-        ''' checks playing status of current player
+    def subscribe(self):
+        ''' subscribes to PropertiesChanged signals of mpris players
+        '''
+
+        self.glib_context = use_glib_mainloop()
+        session_bus = dbus.SessionBus()
+        self.receivers = [
+            session_bus.add_signal_receiver(
+                self.on_properties_changed,
+                signal_name='PropertiesChanged',
+                dbus_interface='org.freedesktop.DBus.Properties',
+                path='/org/mpris/MediaPlayer2'),
+            session_bus.add_signal_receiver(
+                self.on_seeked,
+                signal_name='Seeked',
+                dbus_interface=MPRIS_PLAYER,
+                path='/org/mpris/MediaPlayer2'),
+            session_bus.add_signal_receiver(
+                self.on_name_owner_changed,
+                signal_name='NameOwnerChanged',
+                dbus_interface='org.freedesktop.DBus',
+                bus_name='org.freedesktop.DBus',
+                path='/org/freedesktop/DBus')
+        ]
+
+    def close(self):
+        ''' removes signal receivers and closes mpd connection
+        '''
+
+        for receiver in self.receivers:
+            receiver.remove()
+        self.receivers = []
+
+        if self.mpd_client is not None:
+            self.mpd_disconnect()
+
+    def on_properties_changed(self, interface, changed, invalidated):
+        ''' PropertiesChanged signal handler, marks player state as changed
+        '''
+
+        if interface == MPRIS_PLAYER:
+            self.changed = True
+
+    def on_seeked(self, position):
+        ''' Seeked signal handler, position is read again on next use
+        '''
+
+        self.position_due = 0
+
+    def on_name_owner_changed(self, name, old_owner, new_owner):
+        ''' NameOwnerChanged signal handler, adds started and drops closed players
+        '''
+
+        if self.players_listed is None or not MPRIS_NAME.search(name):
+            return
+
+        if new_owner:
+            try:
+                self.add_proxy(name)
+            except dbus.exceptions.DBusException:
+                pass
+        else:
+            self.proxies.pop(name, None)
+        self.changed = True
+
+    def add_proxy(self, service):
+        ''' returns properties interface of mpris player, kept for later lookups
         '''
 
-        if self.player_interface:
-            status = self.player_interface.Get(
-                'org.mpris.MediaPlayer2.Player', 'PlaybackStatus')
-            self.running = (status == 'Playing')
+        # introspection is not needed for Get/GetAll, saves a round trip
+        player_bus = dbus.SessionBus().get_object(
+            service, '/org/mpris/MediaPlayer2', introspect=False)
+        interface = dbus.Interface(
+            player_bus, 'org.freedesktop.DBus.Properties')
+        self.proxies[service] = interface
+
+        return interface
+
+    def mpris_players(self):
+        ''' returns {service name: properties interface} of mpris players
+
+            bus names are listed once in event mode (then kept up to date
+            by NameOwnerChanged), otherwise every PLAYERS_INTERVAL seconds
+        '''
+
+        now = time.monotonic()
+        if self.players_listed is None or \
+                (not self.events and now - self.players_listed >= PLAYERS_INTERVAL):
+            self.players_listed = now
+            self.proxies = {}
+            for service in dbus.SessionBus().list_names():
+                if MPRIS_NAME.search(service):
+                    try:
+                        self.add_proxy(service)
+                    except dbus.exceptions.DBusException:
+                        pass
+
+        return self.proxies
+
+    def dispatch_events(self):
+        ''' handles pending dbus signals without blocking
+        '''
+
+        while self.glib_context.pending():
+            self.glib_context.iteration(False)
+
+    def fds(self):
+        ''' returns files that become readable when player may have changed,
+            dbus connection in event mode and mpd connection while idling
+        '''
+
+        fds = []
+        if self.events:
+            try:
+                fds.append(dbus.SessionBus().get_unix_fd())
+            except (dbus.exceptions.DBusException, AttributeError):
+                pass
+        if self.mpd_idling and self.mpd_client is not None:
+            fds.append(self.mpd_client)
+
+        return fds
 
     # def get_players(self):
     #     players = []
@@ -54,39 +232,132 @@ class Player:
     #     return players
 
     def get_active_player(self):
-        ''' returns name of playing media source/player
+        ''' finds playing media source/player
+            returns its player properties (GetAll), None if no player is playing
         '''
 
-        session_bus = dbus.SessionBus()
-        for service in session_bus.list_names():
-            if re.findall(r'org.mpris.MediaPlayer2|plasma-browser-integration', service, re.IGNORECASE):
-                obj = session_bus.get_object(
-                    service, '/org/mpris/MediaPlayer2')
-                interface = dbus.Interface(
-                    obj, 'org.freedesktop.DBus.Properties')
-                status = interface.Get(
-                    'org.mpris.MediaPlayer2.Player', 'PlaybackStatus')
-
-                if status == 'Playing':
-                    self.player_name = service.split('MediaPlayer2.')[-1]
-                    self.player_interface = interface
-                    self.running = True
-                    return
+        for service, interface in list(self.mpris_players().items()):
+            try:
+                properties = interface.GetAll(MPRIS_PLAYER)
+            except dbus.exceptions.DBusException:
+                # player closed since names were listed
+                self.proxies.pop(service, None)
+                continue
+
+            if properties.get('PlaybackStatus') == 'Playing':
+                self.player_name = service.split('MediaPlayer2.')[-1]
+                self.player_interface = interface
+                self.running = True
+                return properties
 
-    def mpd_active(self):
-        """ Check if mpd is active and get metadata """
-        client = mpd()
+        return None
+
+    def mpd_connect(self):
+        ''' returns connected mpd client, the connection is kept for whole session
+            reconnects with exponential backoff if connection is lost
+
+            returns None if mpd is not reachable
+        '''
+
+        if self.mpd_client is not None:
+            return self.mpd_client
+
+        if time.monotonic() < self.mpd_retry_at:
+            return None
+
+        from mpd import MPDClient
+
+        client = MPDClient()
         try:
             client.connect(self.mpd_host, self.mpd_port)
+            if self.mpd_pass != '':
+                client.password(self.mpd_pass)
         except Exception as e:
+            self.mpd_disconnect(client)
+            self.mpd_retry_at = time.monotonic() + self.mpd_backoff
+            self.mpd_backoff = min(self.mpd_backoff * 2, MPD_MAX_BACKOFF)
+            return None
+
+        self.mpd_backoff = MPD_MIN_BACKOFF
+        self.mpd_client = client
+        self.mpd_idling = False
+        return client
+
+    def mpd_disconnect(self, client=None):
+        ''' closes mpd connection
+        '''
+
+        client = client or self.mpd_client
+        self.mpd_client = None
+        self.mpd_idling = False
+
+        try:
+            client.disconnect()
+        except Exception as e:
+            pass
+
+    def mpd_changed(self, client):
+        ''' returns True if mpd reported a player change (track, state)
+            since last check, does not block
+
+            waits for changes with mpd "idle player" command
+        '''
+
+        if not self.mpd_idling:
+            # no idle pending, state has to be read
+            return True
+
+        readable, _, _ = select([client], [], [], 0)
+        if not readable:
             return False
 
-        if self.mpd_pass != '':
-            client.password(self.mpd_pass)
+        client.fetch_idle()
+        self.mpd_idling = False
+        return True
+
+    def mpd_drain(self):
+        ''' reads idle reply mpd has sent, also while mpris player is followed
+            (mpd_active is not called then), unread reply keeps
+            mpd connection readable
+        '''
+
+        try:
+            # next mpd_active reads mpd state, idle has ended
+            self.mpd_changed(self.mpd_client)
+        except Exception as e:
+            self.mpd_disconnect()
+
+    def mpd_active(self):
+        """ Check if mpd is active and get metadata """
+        client = self.mpd_connect()
+        if client is None:
+            self.mpd_playing = False
+            return False
 
-        if client.status()['state'] == 'play':
+        try:
+            if self.mpd_changed(client):
+                changed = self.mpd_update(client)
+                client.send_idle('player')
+                self.mpd_idling = True
+            else:
+                changed = False
+        except Exception as e:
+            # connection lost, reconnect on next tick
+            self.mpd_disconnect()
+            self.mpd_playing = False
+            changed = False
+
+        self.running = self.mpd_playing
+        return changed
+
+    def mpd_update(self, client):
+        """ reads mpd status and metadata, returns True if track changed """
+        status = client.status()
+        if status['state'] == 'play':
             self.player_name = "mpd"
-            self.running = True
+            self.mpd_playing = True
+            # seek, pause and track change end idle, elapsed stays valid until then
+            self.set_position(float(status.get('elapsed', 0)), True)
             currentsong = client.currentsong()
 
             if 'album' in currentsong:
@@ -102,25 +373,88 @@ class Player:
             if self.track.title != title:
                 self.track.update(artist, title, album, trackid)
                 self.refresh()
+                if self.prefetch_count > 0:
+                    self.prefetch(self.mpd_upcoming(client, status))
                 return True
         else:
-            self.running = False
+            self.mpd_playing = False
         return False
 
+    def mpris_upcoming(self):
+        ''' returns track names of upcoming tracks from mpris TrackList
+            returns empty list if player does not support TrackList
+        '''
+
+        try:
+            tracks = list(self.player_interface.Get(
+                'org.mpris.MediaPlayer2.TrackList', 'Tracks'))
+            if self.track.trackid not in tracks:
+                return []
+
+            start = tracks.index(self.track.trackid) + 1
+            trackids = tracks[start:start + self.prefetch_count]
+            if len(trackids) == 0:
+                return []
+
+            tracklist = dbus.Interface(self.player_interface.proxy_object,
+                                       'org.mpris.MediaPlayer2.TrackList')
+            tracks_metadata = tracklist.GetTracksMetadata(trackids)
+        except dbus.exceptions.DBusException:
+            return []
+
+        track_names = []
+        for metadata in tracks_metadata:
+            title = metadata.get('xesam:title', '')
+            artist = metadata.get('xesam:artist', '')
+            artist = artist[0] if isinstance(artist, list) else artist
+
+            if title.strip() != '':
+                track_names.append(f'{artist.strip()} - {title.strip()}')
+
+        return track_names
+
+    def mpd_upcoming(self, client, status):
+        ''' returns track names of upcoming tracks in mpd playlist
+        '''
+
+        if 'nextsong' not in status:
+            return []
+
+        start = int(status['nextsong'])
+        songs = client.playlistinfo(f'{start}:{start + self.prefetch_count}')
+
+        track_names = []
+        for song in songs:
+            if 'title' not in song or 'artist' not in song:
+                continue
+
+            title, artist = song['title'], song['artist']
+            # multiple tag values are returned as list
+            title = title[0] if isinstance(title, list) else title
+            artist = artist[0] if isinstance(artist, list) else artist
+            track_names.append(f'{artist} - {title}')
+
+        return track_names
+
+    def prefetch(self, track_names):
+        ''' fetches lyrics of upcoming tracks into cache in background
+        '''
+
+        self.fetcher.prefetch(track_names, self.default_source)
+
     def get_bus(self):
-        ''' gets dbus session bus and player interface
+        ''' gets player interface from cached mpris players
+            returns player properties if they were read already, otherwise None
         '''
 
         try:
             if self.autoswitch:
-                self.get_active_player()
-            else:
-                session_bus = dbus.SessionBus()
-                player_bus = session_bus.get_object(
-                    f'org.mpris.MediaPlayer2.{self.player_name}', '/org/mpris/MediaPlayer2')
-                self.player_interface = dbus.Interface(
-                    player_bus, 'org.freedesktop.DBus.Properties')
-                self.running = True
+                return self.get_active_player()
+
+            # new proxy, player may have been restarted with another bus owner
+            self.player_interface = self.add_proxy(
+                f'org.mpris.MediaPlayer2.{self.player_name}')
+            self.running = True
 
         except dbus.exceptions.DBusException:
             self.running = False
@@ -130,16 +464,36 @@ class Player:
         ''' checks if player or track have changed or not
         '''
 
+        if not self.mpris:
+            return self.mpd_enabled and self.mpd_active()
+
+        if self.mpd_idling:
+            self.mpd_drain()
+
+        if self.events:
+            self.dispatch_events()
+            if self.running and self.player_interface and not self.changed:
+                # nothing signalled since last check
+                return False
+            self.changed = False
+
         try:
-            if self.autoswitch:
-                self.check_playing()
+            # all player properties are read with a single GetAll call
+            properties = None
+            if self.running and self.player_interface:
+                properties = self.player_interface.GetAll(MPRIS_PLAYER)
+                if self.autoswitch:
+                    # current player stopped, look for a playing one
+                    self.running = (properties.get('PlaybackStatus') == 'Playing')
 
             if not self.running:
-                self.get_bus()
+                properties = self.get_bus() or properties
 
-            metadata = self.player_interface.Get(
-                "org.mpris.MediaPlayer2.Player", "Metadata")
+            if properties is None:
+                properties = self.player_interface.GetAll(MPRIS_PLAYER)
+            metadata = properties['Metadata']
             self.running = True
+            self.update_position(properties)
         except Exception as e:
             self.running = False
             self.player_interface = None
@@ -178,19 +532,290 @@ class Player:
                 # update track
                 self.track.update(artist, title, album, trackid)
                 self.refresh()
+                if self.prefetch_count > 0:
+                    self.prefetch(self.mpris_upcoming())
                 return True
 
-        elif MPD_ENABLED:
+        elif self.mpd_enabled:
             return self.mpd_active()
 
         return False
 
+    def set_position(self, position, playing):
+        ''' sets playback position (seconds) read from player
+        '''
+
+        self.position_base = position
+        self.position_at = time.monotonic()
+        self.playing = playing
+
+    def read_position(self):
+        ''' reads playback position of mpris player
+        '''
+
+        try:
+            properties = self.player_interface.GetAll(MPRIS_PLAYER)
+        except dbus.exceptions.DBusException:
+            self.position_at = None
+            return
+
+        self.update_position(properties)
+
+    def update_position(self, properties):
+        ''' sets playback position from mpris player properties (GetAll)
+        '''
+
+        playing = (properties.get('PlaybackStatus') == 'Playing')
+        if 'Position' not in properties:
+            if playing != self.playing:
+                # paused or resumed, position is not known anymore
+                self.position_at = None
+            self.playing = playing
+            return
+
+        # microseconds
+        self.set_position(int(properties['Position']) / 1e6, playing)
+        self.position_due = time.monotonic() + self.sync_interval
+
+    def position(self):
+        ''' returns estimated playback position in seconds, None if not known
+        '''
+
+        now = time.monotonic()
+        if self.player_interface is not None and now >= self.position_due:
+            self.position_due = now + self.sync_interval
+            self.read_position()
+
+        if self.position_at is None:
+            return None
+        if not self.playing:
+            return self.position_base
+
+        return self.position_base + now - self.position_at
+
+    @property
+    def fetching(self):
+        ''' returns True if lyrics of current track are being fetched
+        '''
+        return self.fetcher.busy
+
     def refresh(self, source=None, cache=True):
         ''' Re-fetches lyrics from procided source
             source -> source name ('google' or 'azlyrics')
             cache -> bool | wether to store cache file
+
+            cached lyrics are loaded right away, otherwise
+            lyrics are fetched in background (see check_lyrics)
         '''
 
         if source is None:
             source = self.default_source
-        self.track.get_lyrics(source, cache=cache)
+
+        self.track.source = source
+
+        if cache:
+            lyrics = util.get_cached_lyrics(self.track.track_name, source)
+            if lyrics is not None:
+                self.fetcher.cancel()
+                self.track.set_lyrics(lyrics)
+                return
+
+        self.track.set_lyrics(['fetching lyrics...'])
+        self.fetcher.submit(self.track.track_name, source, cache=cache)
+
+    def check_lyrics(self):
+        ''' swaps in lyrics fetched in background
+            returns True if lyrics of current track have arrived
+        '''
+
+        lyrics = self.fetcher.result(self.track.track_name)
+        if lyrics is None:
+            return False
+
+        self.track.set_lyrics(lyrics)
+        return True
+
+    def switch(self, step=1):
+        ''' switches focus to step-th next player, returns True if focus changed
+            single player, focus never changes
+        '''
+
+        return False
+
+    def set_alignment(self, alignment):
+        self.track.alignment = alignment
+        if self.track.lyrics is not None:
+            self.track.reset_width()
+
+
+class PlayerGroup:
+    ''' follows all mpris players and mpd at once (dashboard mode)
+        one player is focused and shown, others keep tracking their track
+        and lyrics in background, so switching focus does not re-fetch
+
+        same interface as Player, calls are passed to focused player
+    '''
+
+    def __init__(self, source, autoswitch, mpd_connect, **kwargs):
+        self._default_source = source
+        self.autoswitch = autoswitch
+        self.mpd_connect = mpd_connect
+        self.kwargs = kwargs
+
+        # service name -> Player, in order of discovery
+        self.players = {}
+        self.focus = None
+        self.players_listed = None
+        # shown when no player is found
+        self.idle_track = Track(align=kwargs.get('align', 1))
+
+        if kwargs.get('events') and EVENTS_ENABLED:
+            # discover() connects to session bus before any pane subscribes
+            use_glib_mainloop()
+
+        if MPD_ENABLED:
+            self.players['mpd'] = Player('mpd', source, False, mpd_connect,
+                                         mpris=False, **kwargs)
+        self.discover()
+        self.focus_running()
+
+    def discover(self):
+        ''' adds a Player for every new mpris player on session bus,
+            drops players that have closed
+            bus names are listed every PLAYERS_INTERVAL seconds
+        '''
+
+        now = time.monotonic()
+        if self.players_listed is not None and now - self.players_listed < PLAYERS_INTERVAL:
+            return
+        self.players_listed = now
+
+        try:
+            services = [str(name) for name in dbus.SessionBus().list_names()
+                        if MPRIS_NAME.search(name)]
+        except dbus.exceptions.DBusException:
+            return
+
+        for service in services:
+            if service.endswith('MediaPlayer2.mpd') and 'mpd' in self.players:
+                # mpd is followed by its own player already
+                continue
+            if service not in self.players:
+                self.players[service] = Player(
+                    service.split('MediaPlayer2.')[-1], self._default_source,
+                    False, self.mpd_connect, mpd=False, **self.kwargs)
+
+        for service in list(self.players):
+            if service != 'mpd' and service not in services:
+                self.players.pop(service).close()
+                if self.focus == service:
+                    self.focus = None
+
+    def focus_running(self):
+        ''' with autoswitch, focuses first playing player if focused one is not playing
+            returns True if focus changed
+        '''
+
+        focused = self.focused
+        if focused is not None and (not self.autoswitch or
+                                    (focused.running and focused.playing)):
+            return False
+
+        for service, player in self.players.items():
+            if player.running and player.playing:
+                self.focus = service
+                return player is not focused
+
+        if focused is None and len(self.players) > 0:
+            running = [s for s, p in self.players.items() if p.running]
+            self.focus = (running or list(self.players))[0]
+            return True
+        return False
+
+    @property
+    def focused(self):
+        return self.players.get(self.focus)
+
+    def switch(self, step=1):
+        ''' switches focus to step-th next player, returns True if focus changed
+        '''
+
+        services = list(self.players)
+        if len(services) < 2:
+            return False
+
+        i = services.index(self.focus) if self.focus in services else 0
+        self.focus = services[(i + step) % len(services)]
+        return True
+
+    def update(self):
+        ''' updates all players, returns True if focused track or focus have changed
+        '''
+
+        self.discover()
+        focused = self.focused
+        changed = False
+        for player in self.players.values():
+            # other players fetch lyrics of their new tracks in background
+            changed |= player.update() and player is focused
+
+        return self.focus_running() or changed
+
+    def set_alignment(self, alignment):
+        ''' aligns lyrics of all players, panes look the same after switching
+        '''
+
+        self.idle_track.alignment = alignment
+        for player in self.players.values():
+            player.set_alignment(alignment)
+
+    def fds(self):
+        fds = []
+        for player in self.players.values():
+            fds += [fd for fd in player.fds() if fd not in fds]
+
+        return fds
+
+    def check_lyrics(self):
+        arrived = False
+        for player in self.players.values():
+            arrived |= player.check_lyrics() and player is self.focused
+
+        return arrived
+
+    def refresh(self, source=None, cache=True):
+        if self.focused is not None:
+            self.focused.refresh(source, cache)
+
+    def position(self):
+        return None if self.focused is None else self.focused.position()
+
+    @property
+    def track(self):
+        return self.idle_track if self.focused is None else self.focused.track
+
+    @property
+    def running(self):
+        return self.focused is not None and self.focused.running
+
+    @property
+    def playing(self):
+        return self.focused is not None and self.focused.playing
+
+    @property
+    def fetching(self):
+        return self.focused is not None and self.focused.fetching
+
+    @property
+    def player_name(self):
+        return 'player' if self.focused is None else self.focused.player_name
+
+    @property
+    def default_source(self):
+        return self._default_source
+
+    @default_source.setter
+    def default_source(self, source):
+        self._default_source = source
+        for player in self.players.values():
+            player.default_source = source
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from lyrics import util
+from lyrics.net import transient
+
+from collections import deque
+from threading import Thread, Event, Lock
+from queue import Queue
+import os
+import time
+
+
+class Provider:
+    ''' lyrics source, subclasses implement fetch()
+
+        records hit rate and latency of every fetch,
+        used to order providers by how fast and reliable they are
+    '''
+    name = None
+
+    def __init__(self, samples=100):
+        self.attempts = 0
+        self.found = 0
+        self.latencies = deque(maxlen=samples)
+        self.lock = Lock()
+
+    def fetch(self, track_name):
+        ''' returns list of lyrics lines
+            if lyrics not found returns error string
+        '''
+        raise NotImplementedError
+
+    def get(self, track_name):
+        ''' fetches lyrics and records hit rate and latency
+        '''
+        start = time.monotonic()
+        try:
+            lyrics_lines = self.fetch(track_name)
+        except Exception as e:
+            lyrics_lines = str(e)
+
+        with self.lock:
+            self.attempts += 1
+            self.found += not isinstance(lyrics_lines, str)
+            self.latencies.append(time.monotonic() - start)
+
+        return lyrics_lines
+
+    @property
+    def hit_rate(self):
+        return self.found / self.attempts if self.attempts else 0
+
+    def percentile(self, p):
+        ''' returns p-th percentile of latency in seconds
+        '''
+        with self.lock:
+            latencies = sorted(self.latencies)
+        if len(latencies) == 0:
+            return 0
+
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p / 100))]
+
+    def score(self):
+        ''' expected time to get lyrics, lower is better
+            providers not tried yet come first
+        '''
+        if self.attempts == 0:
+            return 0
+        return self.percentile(50) / max(self.hit_rate, 0.05)
+
+    def stats(self):
+        return (f'{self.hit_rate:.0%} found, p50 {self.percentile(50):.2f}s, '
+                f'p90 {self.percentile(90):.2f}s')
+
+
+class GoogleProvider(Provider):
+    name = 'google'
+
+    def fetch(self, track_name):
+        return util.get_google_lyrics(util.url + util.query(track_name))
+
+
+class AZLyricsProvider(Provider):
+    name = 'azlyrics'
+
+    def fetch(self, track_name):
+        return util.get_azlyrics(util.url + util.query(track_name))
+
+
+class LocalProvider(Provider):
+    ''' reads lyrics from a directory of text files
+        named "{artist} - {title}.lrc" (or .txt)
+        synced lyrics (.lrc) are preferred
+    '''
+    name = 'local'
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = os.path.expanduser(path)
+
+    def fetch(self, track_name):
+        for filename in (track_name + '.lrc', track_name + '.txt',
+                         util.cache_key(track_name)):
+            filepath = os.path.join(self.path, filename)
+            if os.path.isfile(filepath):
+                with open(filepath) as file:
+                    return file.read().splitlines()
+
+        return 'No local lyrics file found!'
+
+
+PROVIDERS = {}
+
+# source ordering all providers by speed and hit rate
+AUTO = 'auto'
+
+
+def register(provider):
+    ''' adds provider to registry, replaces provider with same name
+    '''
+    PROVIDERS[provider.name] = provider
+
+
+def get_provider(name):
+    return PROVIDERS.get(name)
+
+
+def is_source(name):
+    ''' returns True if name is a registered provider or auto
+    '''
+    return name == AUTO or name in PROVIDERS
+
+
+def ordered(first=None):
+    ''' returns providers ordered by observed speed and hit rate
+        first -> name of provider to put in front
+    '''
+    providers = sorted(PROVIDERS.values(), key=lambda p: p.score())
+
+    if first in PROVIDERS:
+        providers.remove(PROVIDERS[first])
+        providers.insert(0, PROVIDERS[first])
+
+    return providers
+
+
+def fetch(track_name, source=None, race_delay=None):
+    ''' fetches lyrics from providers, source is tried first
+        returns list of strings
+
+        race_delay -> seconds | if not None, providers are raced
+
+        if lyrics not found in any provider returns error string
+        of a failure that may pass (net.transient) if any provider had one,
+        otherwise of last provider
+    '''
+    providers = ordered(source)
+    if len(providers) == 0:
+        return 'No lyrics source available!'
+
+    if race_delay is not None:
+        return race(providers, track_name, race_delay)
+
+    error = None
+    for provider in providers:
+        lyrics_lines = provider.get(track_name)
+        if not isinstance(lyrics_lines, str):
+            return lyrics_lines
+        error = worse(error, lyrics_lines)
+
+    return error
+
+
+def worse(error, new_error):
+    ''' returns error to report of two failed providers,
+        transient failure wins, lyrics may exist after all
+    '''
+    if error is not None and transient(error):
+        return error
+    return new_error
+
+
+def race(providers, track_name, delay=0):
+    ''' fetches lyrics from providers concurrently
+        returns first valid lyrics, list of strings
+
+        requests are hedged, n-th provider starts after n * delay (seconds)
+        or as soon as a running request fails. requests still running
+        when lyrics are found are left to finish, their result is dropped
+    '''
+    results = Queue()
+    found = Event()
+    hedges = [Event() for _ in providers]
+
+    def fetch(i, provider):
+        if i > 0:
+            hedges[i].wait(delay * i)
+            # mark as started
+            hedges[i].set()
+        if found.is_set():
+            # lyrics found already, skip request
+            return
+        results.put(provider.get(track_name))
+
+    for i, provider in enumerate(providers):
+        Thread(target=fetch, args=(i, provider), daemon=True).start()
+
+    error = None
+    for i in range(len(providers)):
+        lyrics_lines = results.get()
+        if not isinstance(lyrics_lines, str):
+            found.set()
+            for hedge in hedges:
+                hedge.set()
+            return lyrics_lines
+
+        error = worse(error, lyrics_lines)
+        # start next waiting request right away
+        for hedge in hedges[1:]:
+            if not hedge.is_set():
+                hedge.set()
+                break
+
+    return error
+
+
+register(GoogleProvider())
+register(AZLyricsProvider())
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import re
+
+
+class SearchIndex:
+    ''' case-insensitive search in laid out lyrics lines
+
+        lines are lowercased once per layout, results of the last query
+        are kept so a query extended while typing only scans lines
+        that matched before
+    '''
+
+    def __init__(self, lines):
+        self.lines = lines
+        self.lower = [line.lower() for line in lines]
+
+        # (query, regex, word, matches) of last search
+        self.last = None
+
+    def pattern(self, query, regex=False, word=False):
+        ''' returns compiled pattern for query, None if query is not valid regex
+        '''
+        if not regex:
+            query = re.escape(query)
+        if word:
+            query = r'\b(?:{})\b'.format(query)
+
+        try:
+            return re.compile(query, re.IGNORECASE)
+        except re.error:
+            return None
+
+    def search(self, query, regex=False, word=False):
+        ''' returns list of (line number, [(start, end), ...]) of matches
+
+            query -> text to find, case-insensitive
+            regex -> bool | whether query is a regular expression
+            word -> bool | whether to match whole words only
+        '''
+        if query == '':
+            return []
+
+        candidates = range(len(self.lines))
+        if self.last is not None and not regex and not word:
+            last_query, last_regex, last_word, last_matches = self.last
+            # plain query extended while typing, only previous matches can match
+            # (not for whole words, "them" matches where "the" did not)
+            if not last_regex and not last_word and query.startswith(last_query):
+                candidates = [line_num for line_num, _ in last_matches]
+
+        if regex or word:
+            matches = self.search_pattern(self.pattern(query, regex, word), candidates)
+        else:
+            matches = self.search_text(query.lower(), candidates)
+
+        self.last = (query, regex, word, matches)
+        return matches
+
+    def search_text(self, query, candidates):
+        matches = []
+        for line_num in candidates:
+            line = self.lower[line_num]
+            spans = []
+            start = line.find(query)
+            while start >= 0:
+                spans.append((start, start + len(query)))
+                start = line.find(query, start + len(query))
+            if spans:
+                matches.append((line_num, spans))
+
+        return matches
+
+    def search_pattern(self, pattern, candidates):
+        if pattern is None:
+            return []
+
+        matches = []
+        for line_num in candidates:
+            spans = [m.span() for m in pattern.finditer(self.lines[line_num]) if m.end() > m.start()]
+            if spans:
+                matches.append((line_num, spans))
+
+        return matches
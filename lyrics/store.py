@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from lyrics import CACHE_PATH
+from lyrics.parse import KEY_CHARS
+
+from collections import OrderedDict
+from threading import Lock, get_ident
+import os
+import shutil
+import time
+
+
+class FileStore:
+    ''' lyrics cache with one text file per track in CACHE_PATH
+    '''
+
+    def __init__(self, path=CACHE_PATH):
+        self.path = path
+
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+
+    def filepath(self, key):
+        return os.path.join(self.path, key)
+
+    def __contains__(self, key):
+        return os.path.isfile(self.filepath(key))
+
+    def get(self, key):
+        ''' returns list of lyrics lines, None if not cached
+        '''
+        try:
+            with open(self.filepath(key)) as file:
+                return file.read().splitlines()
+        except (FileNotFoundError, IsADirectoryError):
+            return None
+
+    def set(self, key, lines):
+        with open(self.filepath(key), 'w') as file:
+            file.writelines(line + '\n' for line in lines)
+
+    def delete(self, key):
+        ''' returns -> bool | whether the delete operation occured or not
+        '''
+        try:
+            os.remove(self.filepath(key))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def miss_path(self, key, source=None):
+        ''' returns path of miss record of (key, source), or directory
+            of all records of key if source is None
+        '''
+        # dot keeps it apart from lyrics files, cache keys have no dots
+        path = os.path.join(self.path, '.misses.d', key)
+        if source is None:
+            return path
+        # source is a file name like key, never a path
+        return os.path.join(path, KEY_CHARS.sub('', source))
+
+    def get_miss(self, key, source):
+        ''' returns (count, checked) of lyrics not found, None if not recorded
+        '''
+        try:
+            with open(self.miss_path(key, source)) as file:
+                count, checked = file.read().split()
+            return int(count), float(checked)
+        except (OSError, ValueError):
+            return None
+
+    def set_miss(self, key, source, count, checked):
+        ''' records miss in its own file, written atomically so other
+            processes (pager, daemon, batch) never read a partial record
+        '''
+        path = self.miss_path(key, source)
+        temp_path = f'{path}.{os.getpid()}.{get_ident()}.tmp'
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(temp_path, 'w') as file:
+                file.write(f'{count} {checked}')
+            os.replace(temp_path, path)
+        except OSError:
+            # cleared meanwhile, lyrics were found
+            pass
+
+    def clear_misses(self, key):
+        shutil.rmtree(self.miss_path(key), ignore_errors=True)
+
+
+class SQLiteStore:
+    ''' lyrics cache in a single sqlite database file with keyed lookups
+
+        lyrics files of FileStore in the same directory are imported
+        once, when the database is created
+    '''
+
+    def __init__(self, path=CACHE_PATH):
+        self.path = path
+
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+
+        import sqlite3
+
+        # connection is shared with fetcher threads
+        self.lock = Lock()
+        self.db = sqlite3.connect(os.path.join(self.path, 'lyrics.db'),
+                                  check_same_thread=False)
+
+        with self.lock, self.db:
+            self.db.execute('CREATE TABLE IF NOT EXISTS lyrics '
+                            '(key TEXT PRIMARY KEY, text TEXT NOT NULL)')
+            self.db.execute('CREATE TABLE IF NOT EXISTS meta '
+                            '(name TEXT PRIMARY KEY, value TEXT)')
+            self.db.execute('CREATE TABLE IF NOT EXISTS misses '
+                            '(key TEXT, source TEXT, count INTEGER, checked REAL, '
+                            'PRIMARY KEY (key, source))')
+
+        self.migrate()
+
+    def migrate(self):
+        ''' imports lyrics files of FileStore layout, runs only once
+        '''
+        with self.lock:
+            done = self.db.execute(
+                "SELECT value FROM meta WHERE name = 'migrated'").fetchone()
+        if done:
+            return
+
+        files = FileStore(self.path)
+        rows = []
+        for entry in os.scandir(self.path):
+            # keys never contain '.', skips database and hidden files
+            if not entry.is_file() or '.' in entry.name:
+                continue
+            try:
+                rows.append((entry.name, '\n'.join(files.get(entry.name))))
+            except UnicodeDecodeError:
+                continue
+
+        with self.lock, self.db:
+            self.db.executemany(
+                'INSERT OR IGNORE INTO lyrics (key, text) VALUES (?, ?)', rows)
+            self.db.execute(
+                "INSERT INTO meta (name, value) VALUES ('migrated', '1')")
+
+    def __contains__(self, key):
+        with self.lock:
+            row = self.db.execute(
+                'SELECT 1 FROM lyrics WHERE key = ?', (key,)).fetchone()
+        return row is not None
+
+    def get(self, key):
+        ''' returns list of lyrics lines, None if not cached
+        '''
+        with self.lock:
+            row = self.db.execute(
+                'SELECT text FROM lyrics WHERE key = ?', (key,)).fetchone()
+        return None if row is None else row[0].splitlines()
+
+    def set(self, key, lines):
+        with self.lock, self.db:
+            self.db.execute('INSERT OR REPLACE INTO lyrics (key, text) VALUES (?, ?)',
+                            (key, '\n'.join(lines)))
+
+    def delete(self, key):
+        ''' returns -> bool | whether the delete operation occured or not
+        '''
+        with self.lock, self.db:
+            cursor = self.db.execute('DELETE FROM lyrics WHERE key = ?', (key,))
+        return cursor.rowcount > 0
+
+    def get_miss(self, key, source):
+        ''' returns (count, checked) of lyrics not found, None if not recorded
+        '''
+        with self.lock:
+            return self.db.execute(
+                'SELECT count, checked FROM misses WHERE key = ? AND source = ?',
+                (key, source)).fetchone()
+
+    def set_miss(self, key, source, count, checked):
+        with self.lock, self.db:
+            self.db.execute('INSERT OR REPLACE INTO misses (key, source, count, checked) '
+                            'VALUES (?, ?, ?, ?)', (key, source, count, checked))
+
+    def clear_misses(self, key):
+        with self.lock, self.db:
+            self.db.execute('DELETE FROM misses WHERE key = ?', (key,))
+
+
+class MemoryEntry:
+    ''' lyrics lines of a track with their recent layouts
+    '''
+
+    def __init__(self, lines):
+        self.lines = lines
+        self.layouts = OrderedDict()
+
+
+class MemoryCache:
+    ''' in-process lru of recently used lyrics, keyed by (track name, source)
+
+        size -> number of tracks to keep (0 disables cache)
+        layouts -> number of layouts (wrap/align results) kept per track
+        stats -> bool | whether to count hits and misses
+    '''
+
+    def __init__(self, size=32, layouts=4, stats=False):
+        self.size = size
+        self.layouts_size = layouts
+        self.stats = stats
+        self.hits = 0
+        self.misses = 0
+
+        self.entries = OrderedDict()
+        # lyrics are stored by fetcher threads as well
+        self.lock = Lock()
+
+    def count(self, hit):
+        if self.stats:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, track_name, source):
+        ''' returns list of lyrics lines, None if not in memory
+        '''
+        with self.lock:
+            entry = self.entries.get((track_name, source))
+            if entry is not None:
+                self.entries.move_to_end((track_name, source))
+
+        self.count(entry is not None)
+        return None if entry is None else entry.lines
+
+    def set(self, track_name, source, lines):
+        if self.size <= 0:
+            return
+
+        with self.lock:
+            self.entries[(track_name, source)] = MemoryEntry(lines)
+            self.entries.move_to_end((track_name, source))
+
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, track_name):
+        ''' drops lyrics of track for every source
+        '''
+        with self.lock:
+            for key in [k for k in self.entries if k[0] == track_name]:
+                del self.entries[key]
+
+    def get_layout(self, track_name, source, lines, key):
+        ''' returns stored layout of lyrics lines, None if not in memory
+            layouts are only returned for the same lines object they were made from
+        '''
+        with self.lock:
+            entry = self.entries.get((track_name, source))
+            if entry is None or entry.lines is not lines or key not in entry.layouts:
+                layout = None
+            else:
+                entry.layouts.move_to_end(key)
+                layout = entry.layouts[key]
+
+        self.count(layout is not None)
+        return layout
+
+    def set_layout(self, track_name, source, lines, key, layout):
+        with self.lock:
+            entry = self.entries.get((track_name, source))
+            if entry is None or entry.lines is not lines:
+                return
+
+            entry.layouts[key] = layout
+            while len(entry.layouts) > self.layouts_size:
+                entry.layouts.popitem(last=False)
+
+
+class Misses:
+    ''' negative cache, remembers tracks lyrics were not found for
+
+        ttl -> seconds until first retry (0 disables negative cache)
+        ttl_max -> maximum seconds between retries,
+                   wait is doubled after every failed retry
+    '''
+
+    def __init__(self, ttl=3600, ttl_max=604800):
+        self.ttl = ttl
+        self.ttl_max = ttl_max
+
+    def known(self, key, source):
+        ''' returns True if lyrics were not found recently, retry not due yet
+        '''
+        if self.ttl <= 0:
+            return False
+
+        miss = get_store().get_miss(key, source)
+        if miss is None:
+            return False
+
+        count, checked = miss
+        wait = min(self.ttl * 2 ** (count - 1), self.ttl_max)
+        return time.time() < checked + wait
+
+    def add(self, key, source):
+        if self.ttl <= 0:
+            return
+
+        miss = get_store().get_miss(key, source)
+        count = 1 if miss is None else miss[0] + 1
+        get_store().set_miss(key, source, count, time.time())
+
+    def clear(self, key):
+        get_store().clear_misses(key)
+
+
+BACKENDS = {
+    'files': FileStore,
+    'sqlite': SQLiteStore
+}
+
+store = None
+
+
+def set_backend(name):
+    ''' selects cache backend ('files' or 'sqlite')
+    '''
+    global store
+    store = BACKENDS.get(name, FileStore)()
+
+
+def get_store():
+    ''' returns lyrics cache store, defaults to FileStore
+    '''
+    if store is None:
+        set_backend('files')
+    return store
+
+
+memory = MemoryCache()
+
+
+def set_memory(size, layouts, stats=False):
+    ''' configures in-memory lyrics cache
+    '''
+    global memory
+    memory = MemoryCache(size, layouts, stats)
+
+
+def get_memory():
+    ''' returns in-memory lyrics cache
+    '''
+    return memory
+
+
+misses = Misses()
+
+
+def set_misses(ttl, ttl_max):
+    ''' configures negative cache
+    '''
+    global misses
+    misses = Misses(ttl, ttl_max)
+
+
+def get_misses():
+    ''' returns negative cache
+    '''
+    return misses
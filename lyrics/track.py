@@ -1,6 +1,10 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-from lyrics import util
+from lyrics import util, parse
+from lyrics.store import get_memory
+from lyrics.search import SearchIndex
+
+from bisect import bisect_right
 
 
 class Track:
@@ -12,18 +16,37 @@ class Track:
 
         self.title = title
         self.artist = artist
+        # laid out lines per (wrap, width, alignment), reset on lyrics/alignment change
+        self.layouts = {}
         self.alignment = align
         self.width = width
         self.length = 0
         self.lyrics = None
+        # lines as fetched, lrc timestamps included
+        self.raw_lyrics = None
+        # timestamps (seconds) of synced lyrics and line of every timestamp
+        self.times = []
+        self.time_rows = []
         self.album = None
         self.trackid = None
+        # source lyrics were fetched from, key of layouts in memory cache
+        self.source = None
 
     def __str__(self):
         ''' trackname in format "{artist} - {title}"
         '''
         return self.artist + ' - ' + self.title
 
+    @property
+    def alignment(self):
+        return self._alignment
+
+    @alignment.setter
+    def alignment(self, alignment):
+        if getattr(self, '_alignment', None) != alignment:
+            self.layouts = {}
+        self._alignment = alignment
+
     @property
     def track_name(self):
         ''' returns trackname in format "{artist} - {title}"
@@ -60,25 +83,120 @@ class Track:
     def get_lyrics(self, source, cache=True):
         ''' fetch lyrics off the internet
         '''
-        self.lyrics = util.get_lyrics(self.track_name, source, cache=cache)
+        self.source = source
+        self.set_lyrics(util.get_lyrics(self.track_name, source, cache=cache))
+
+    def set_lyrics(self, lyrics):
+        ''' set lyrics lines of track (fetched or placeholder)
+        '''
+        self.raw_lyrics = lyrics
+        synced = parse.lrc(lyrics)
+        if synced is None:
+            self.lyrics, self.times, self.time_rows = lyrics, [], []
+        else:
+            self.lyrics, self.times, self.time_rows = synced
+        self.layouts = {}
         self.width = len(max(self.lyrics, key=len))
         self.length = len(self.lyrics)
 
+    def get_layout(self, wrap=False, width=0):
+        ''' returns layout of lyrics [lines, width, text, search index, origins] for viewport
+            origins -> index of first laid out line of every lyrics line
+
+            layouts are computed once per (wrap, width, alignment)
+        '''
+        key = (wrap, width, self.alignment)
+        layout = self.layouts.get(key)
+
+        if layout is None:
+            memory = get_memory()
+            cached = memory.get_layout(self.track_name, self.source, self.raw_lyrics, key)
+
+            if cached is None:
+                if wrap:
+                    origins = []
+                    lyrics = util.wrap_text(self.lyrics, width, origins)
+                else:
+                    origins = list(range(len(self.lyrics)))
+                    lyrics = self.lyrics
+
+                lyrics_width = len(max(lyrics, key=len))
+                lyrics = util.align(lyrics, lyrics_width, self.alignment)
+
+                cached = (lyrics, lyrics_width, origins)
+                memory.set_layout(self.track_name, self.source, self.raw_lyrics, key, cached)
+
+            # text and search index are built on first use
+            layout = [cached[0], cached[1], None, None, cached[2]]
+            self.layouts[key] = layout
+
+        return layout
+
+    def get_lines(self, wrap=False, width=0):
+        ''' returns list of laid out lyrics lines
+        '''
+        lines, self.width = self.get_layout(wrap, width)[:2]
+        self.length = len(lines)
+
+        return lines
+
     def get_text(self, wrap=False, width=0):
         ''' returns lyrics text seperated by '\\n'
         '''
-        if wrap:
-            lyrics=util.wrap_text(self.lyrics, width)
-        else:
-            lyrics=self.lyrics
+        layout = self.get_layout(wrap, width)
+        if layout[2] is None:
+            layout[2] = '\n'.join(layout[0])
+
+        lines, self.width, text = layout[:3]
+        self.length = len(lines)
+
+        return text
+
+    def get_search_index(self, wrap=False, width=0):
+        ''' returns search index of laid out lyrics lines
+        '''
+        layout = self.get_layout(wrap, width)
+        if layout[3] is None:
+            layout[3] = SearchIndex(layout[0])
+
+        self.width = layout[1]
+        self.length = len(layout[0])
+
+        return layout[3]
+
+    def get_line(self, row, wrap=False, width=0):
+        ''' returns index of lyrics line laid out at row
+        '''
+        origins = self.get_layout(wrap, width)[4]
+        return max(bisect_right(origins, row) - 1, 0)
+
+    def get_rows(self, line, wrap=False, width=0):
+        ''' returns range of laid out lines of lyrics line
+        '''
+        lines, _, _, _, origins = self.get_layout(wrap, width)
+        end = origins[line + 1] if line + 1 < len(origins) else len(lines)
 
-        self.width = len(max(lyrics, key=len))
-        self.length = len(lyrics)
+        return range(origins[line], end)
 
-        lyrics = util.align(lyrics, self.width, self.alignment)
+    @property
+    def synced(self):
+        ''' returns True if lyrics have timestamps (lrc)
+        '''
+        return len(self.times) > 0
+
+    def line_at(self, position):
+        ''' returns index of synced lyrics line at position (seconds)
+            returns -1 before first timestamp
+        '''
+        i = bisect_right(self.times, position) - 1
+        return self.time_rows[i] if i >= 0 else -1
+
+    def next_time(self, position):
+        ''' returns timestamp of next synced line after position, None after last line
+        '''
+        i = bisect_right(self.times, position)
+        return self.times[i] if i < len(self.times) else None
 
-        return '\n'.join(line for line in lyrics)
-    
     def edit_lyrics(self):
         ''' open lyrics file in text editor present in CONFIG path
         '''
@@ -1,15 +1,14 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-from urllib.request import urlopen, Request
 from urllib.parse import quote
 from textwrap import wrap
-from lyrics import CACHE_PATH
+from functools import lru_cache
+from lyrics.store import get_store, get_memory, get_misses
+from lyrics.net import client, FetchError, transient
+from lyrics import parse
 
-from subprocess import run
 import os
-import tempfile
-import re
 
 
 url = 'https://www.google.com/search?q='
@@ -17,7 +16,6 @@ HEADER = {
     'User-Agent': 'Mozilla/5.0 (compatible; MSIE 10.0; Windows Phone 8.0; Trident/6.0; IEMobile/10.0; ARM; Touch'
 }
 
-CLASS_NAME = r'\w{5,7} \w{4,5} \w{5,7}'  # dependent on User-Agent
 EDITOR = os.environ.get('EDITOR', 'nano')
 initial_text = b"Add lyrics here!"     # placeholder text for lyrics file
 
@@ -25,46 +23,85 @@ initial_text = b"Add lyrics here!"     # placeholder text for lyrics file
 def query(track_name):
     '''encodes search query
     '''
-    track_name = re.sub(r'(\[.*\].*)|(\(.*\).*)', '', track_name).strip()
-    return quote(track_name + ' lyrics')
+    return quote(parse.strip_brackets(track_name) + ' lyrics')
 
 
 def get_html(url, header=HEADER):
     ''' returns html text from given url
+
+        raises FetchError if page cannot be fetched
     '''
+    return client.get(url, header)
+
+
+def search_html(url, regex, header=HEADER, overlap=1024):
+    ''' returns first match of compiled regex in html of given url
+        returns None if not found
+
+        page is read in chunks, reading stops at first match.
+        overlap -> number of chars kept between chunks, longest possible match
+
+        raises FetchError if page cannot be fetched
+    '''
+    stream = client.stream(url, header)
+    buffer = ''
     try:
-        req = Request(url, data=None, headers=header)
-        req_url = urlopen(req)
-    except Exception as e:
-        return 'Cannot connect to internet!', e
+        for chunk in stream:
+            buffer = buffer[-overlap:] + chunk
+            match = regex.search(buffer)
+            if match is not None:
+                return match
+    finally:
+        stream.close()
 
-    if req_url.code != 200:
-        print('invalid request')
-        exit(1)
+    return None
 
-    return req_url.read().decode('utf-8')
 
+def extract_html(url, start, end, header=HEADER):
+    ''' returns text between start and end markers in html of given url
+        returns None if markers not found
 
-def get_az_html(url):
-    ''' finds azlyrics website link and
-        returns html text from azlyrics
+        page is read in chunks, reading stops at end marker
 
-        if azlyrics link not found returns error string
+        raises FetchError if page cannot be fetched
     '''
-    html = get_html(url.replace('lyrics', 'azlyrics'))
-    if isinstance(html, tuple):
-        return html
-
-    regex = re.compile(r'(http[s]?://www.azlyrics.com/lyrics(?:.*?))&amp')
-    az_url = regex.search(html)
+    stream = client.stream(url, header)
+    buffer = ''
+    found = False
+    searched = 0
+    try:
+        for chunk in stream:
+            buffer += chunk
+            if not found:
+                index = buffer.find(start)
+                if index < 0:
+                    # keep tail which may hold beginning of start marker
+                    buffer = buffer[-len(start):]
+                    continue
+                buffer = buffer[index + len(start):]
+                found = True
+
+            index = buffer.find(end, searched)
+            if index >= 0:
+                return buffer[:index]
+            searched = max(0, len(buffer) - len(end))
+    finally:
+        stream.close()
+
+    return None
+
+
+def get_az_url(url):
+    ''' finds azlyrics website link in google search result
+
+        raises FetchError if azlyrics link not found
+    '''
+    az_url = search_html(url.replace('lyrics', 'azlyrics'), parse.AZ_URL)
 
     if az_url == None:
-        return 'No Lyrics Found!'
-    else:
-        header = {'User-Agent': 'Mozilla/5.0 Firefox/70.0'}
-        az_url = az_url.group(1)
-        az_html = get_html(az_url, header)
-        return az_html
+        raise FetchError('No Lyrics Found!')
+
+    return az_url.group(1)
 
 
 def get_azlyrics(url):
@@ -73,148 +110,139 @@ def get_azlyrics(url):
 
         if lyrics not found returns error string
     '''
-    az_html = get_az_html(url)
-    if isinstance(az_html, tuple):
-        return az_html[0]
-
-    az_regex = re.compile(
-        r'<!-- Usage of azlyrics.com content by any third-party lyrics provider is prohibited by our licensing agreement. Sorry about that. -->(.*)<!-- MxM banner -->', re.S)
+    header = {'User-Agent': 'Mozilla/5.0 Firefox/70.0'}
+    try:
+        ly = extract_html(get_az_url(url), parse.AZ_START, parse.AZ_END, header)
+    except FetchError as e:
+        return str(e)
 
-    ly = az_regex.search(az_html)
     if ly == None:
         # Az lyrics not found
         return 'Azlyrics missing...'
 
-    rep = {'&quot;': '\"', '&amp;': '&', '\r': ''}
+    return parse.az_lyrics(ly)
 
-    ly = re.sub(r'<[/]?\w*?>', '', ly.group(1)).strip()
-    # ly = ly.replace('&quot;', '\"').replace('&amp;', '&')
-    # regex = re.compile('|'.join(substrings))
-    ly = re.sub('|'.join(rep.keys()), lambda match: rep[match.group(0)], ly)
-    lyrics_lines = ly.split('\n')
 
-    return lyrics_lines
+def get_google_lyrics(url):
+    ''' fetches lyrics from google search result
+        checks if lyrics are valid
 
+        returns list of strings
+
+        if lyrics not found returns error string
+    '''
+    try:
+        html = get_html(url)
+    except FetchError as e:
+        return str(e)
 
-def fetch_lyrics(url):
-    ''' fetches sources from google, then azlyrics 
-        checks if lyrics are valid 
+    return parse.google_lyrics(html)
 
-        returns list of strings 
 
-        if lyrics not found in both google & azlyrics
-        returns string of error from get_azlyrics()
+def cache_key(track_name):
+    '''returns key of lyrics in cache (file name) from track name with correct format
     '''
-    html = get_html(url)
-    if isinstance(html, tuple):
-        return html[0]
+    return parse.cache_key(track_name)
 
-    html_regex = re.compile(
-        r'<div class="{}">([^>]*?)</div>'.format(CLASS_NAME), re.S)
 
-    text_list = html_regex.findall(html)
+def is_cached(track_name):
+    ''' returns True if lyrics of track are in cache
+    '''
+    return cache_key(track_name) in get_store()
 
-    if len(text_list) < 2:
-        # No google result found!
-        lyrics_lines = get_azlyrics(url)
-    else:
-        ly = []
-        for l in text_list[1:]:
-            # lyrics must be multiline,
-            # ignore the artist info below lyrics
-            if l.count('\n') > 2:
-                ly += l.split('\n')
-        if len(ly) < 5:
-            # too short match for lyrics
-            lyrics_lines = get_azlyrics(url)
-        else:
-            # format lyrics
-            lyrics_lines = ly
 
-    return lyrics_lines
+def get_cached_lyrics(track_name, source):
+    ''' returns list of strings with lines of lyrics from memory or cache
+        returns None if lyrics are not cached
+    '''
+    lyrics_lines = get_memory().get(track_name, source)
 
+    if lyrics_lines is None:
+        lyrics_lines = get_store().get(cache_key(track_name))
+        if lyrics_lines is not None:
+            get_memory().set(track_name, source, lyrics_lines)
 
-def get_filename(track_name):
-    '''returns name of cache file name from track name with correct format
-    '''
-    # removing text in brackets [] ()
-    filename = re.sub(r'(\[.*\].*)|(\(.*\).*)', '', track_name).strip()
-    filename = re.sub(r'\s|\/|\\|\.', '', filename)
-    return os.path.join(CACHE_PATH, filename)
+    return lyrics_lines
 
 
-def get_lyrics(track_name, source, cache=True):
+def get_lyrics(track_name, source, cache=True, race_delay=None):
     ''' returns list of strings with lines of lyrics
-        also reads/write to cache file | if cache=True
+        also reads/write to cache | if cache=True
 
         track_name -> track name in format "artist - title"
-        source -> source to fetch lyrics from ('google' or 'azlyrics')
+        source -> provider to fetch lyrics from first ('google', 'azlyrics', ...)
+                  other providers are tried in order of speed and hit rate
         cache -> bool | whether to check lyrics from cache or not.
+        race_delay -> seconds | if not None, providers are raced
     '''
-    filepath = get_filename(track_name)
+    # providers module depends on util
+    from lyrics import providers
 
-    if not os.path.isdir(CACHE_PATH):
-        os.makedirs(CACHE_PATH)
+    key = cache_key(track_name)
+    lyrics_lines = get_cached_lyrics(track_name, source) if cache else None
+    # source names miss records, may come from a daemon client
+    record_miss = providers.is_source(source)
 
-    if os.path.isfile(filepath) and cache:
-        # lyrics exist
-        with open(filepath) as file:
-            lyrics_lines = file.read().splitlines()
-    else:
-        if source == 'google':
-            lyrics_lines = fetch_lyrics(url + query(track_name))
-        else:
-            lyrics_lines = get_azlyrics(url + query(track_name))
+    if lyrics_lines is None:
+        if cache and record_miss and get_misses().known(key, source):
+            return ['lyrics not found! :(', 'Issue is:', 'Not found recently, retry later.']
+
+        lyrics_lines = providers.fetch(track_name, source, race_delay)
 
         if isinstance(lyrics_lines, str):
+            if record_miss and not transient(lyrics_lines):
+                get_misses().add(key, source)
             return ['lyrics not found! :(', 'Issue is:', lyrics_lines]
 
-        text = map(lambda x: x.replace('&amp;', '&') + '\n', lyrics_lines)
+        get_store().set(key, lyrics_lines)
+        get_misses().clear(key)
 
-        with open(filepath, 'w') as file:
-            file.writelines(text)
+        # cache holds latest lyrics, older fetches of other sources are stale
+        get_memory().invalidate(track_name)
+        get_memory().set(track_name, source, lyrics_lines)
 
     return lyrics_lines
 
 
 def edit_lyrics(track_name):
-    ''' opens local lyrics file in $EDITOR to edit
+    ''' opens lyrics in $EDITOR to edit
         if $EDITOR is not set, defaults to nano
 
-        if local lyrics file does not exists, 
-        then opens temp file
+        lyrics are edited in a temp file and saved back to cache,
+        if lyrics are not cached temp file has placeholder text
     '''
-    filepath = get_filename(track_name)
+    from subprocess import run
+    import tempfile
+
+    key = cache_key(track_name)
+    lyrics_lines = get_store().get(key)
 
-    if os.path.isfile(filepath):
-        # lyrics exist
-        # open text file
-        run([EDITOR, filepath], check=True)
+    if lyrics_lines is None:
+        text = initial_text
     else:
-        # open temp file
-        with tempfile.NamedTemporaryFile(prefix=track_name, suffix=".tmp") as tf:
-            tf.write(initial_text)
-            tf.flush()
-            run([EDITOR, tf.name])
-            tf.seek(0)
-            edited_lyrics = tf.read().decode('utf-8')
-        # save temp file as lyrics cache
-        with open(filepath, 'w') as file:
-            file.writelines(edited_lyrics)
+        text = '\n'.join(lyrics_lines).encode('utf-8')
+
+    # open temp file
+    with tempfile.NamedTemporaryFile(prefix=key, suffix=".tmp") as tf:
+        tf.write(text)
+        tf.flush()
+        run([EDITOR, tf.name])
+        # editors may replace the file, read it again by name
+        with open(tf.name) as file:
+            edited_lyrics = file.read()
+
+    # save temp file as lyrics cache
+    get_store().set(key, edited_lyrics.splitlines())
+    get_misses().clear(key)
+    get_memory().invalidate(track_name)
 
 
 def delete_lyrics(track_name):
-    ''' deletes local lyrics cache file
+    ''' deletes lyrics from cache
         returns -> bool | whether the delete operation occured or not
     '''
-    filepath = get_filename(track_name)
-
-    if os.path.isfile(filepath):
-        # lyrics exist
-        os.remove(filepath)
-        return True
-
-    return False
+    get_memory().invalidate(track_name)
+    return get_store().delete(cache_key(track_name))
 
 
 def align(lines, width, alignment=1):
@@ -236,18 +264,30 @@ def align(lines, width, alignment=1):
         return [line.rjust(width - 1) for line in lines]
 
 
-def wrap_text(text, width):
+@lru_cache(maxsize=2048)
+def wrap_line(line, width):
+    ''' returns tuple of lines of line wrapped to width
+        memoized, resizing back and forth does not wrap lines again
+    '''
+    return tuple(wrap(line, width=width))
+
+
+def wrap_text(text, width, origins=None):
     ''' returns list of strings wrapped accross viewport
+        lines fitting in width are reused as they are,
+        only longer lines are wrapped
 
         text -> list of strings to wrap
         width -> width of viewport to fit text in
+        origins -> list | if given, index of first wrapped line
+                   of every string is appended to it
     '''
     lines = []
     for line in text:
+        if origins is not None:
+            origins.append(len(lines))
         if len(line) > width:
-            line = wrap(line, width=width)
-        if isinstance(line, list):
-            lines += line
+            lines += wrap_line(line, width)
         else:
             lines.append(line)
 
@@ -1,82 +1,197 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-from lyrics.player import Player
 from lyrics.config import Config
+from lyrics.store import get_memory
+from lyrics.providers import PROVIDERS, ordered
 from lyrics import __version__
 
+from select import select
+
 import curses
+import sys
+import time
 
 
 class Key:
+	# actions repeated by a count prefix (10↓) or a held key
+	REPEATABLE = ('down', 'up', 'step-down', 'step-up')
+
 	def __init__(self):
 		self.binds = Config('BINDINGS')
+		self.compile()
+
+		# pending count prefix and multi-key sequence
+		self.count = 0
+		self.sequence = ()
+
+	def compile(self):
+		''' builds table of key sequences to actions from keybindings
+			binding name is action name, or name of provider to re-fetch lyrics from
+		'''
+		self.actions = {}
+		for name, value in self.binds.items():
+			if name == 'step-size':
+				continue
+			keys = tuple(ord(c) for c in value) if isinstance(value, str) else (value,)
+			self.actions[keys] = name
+
+		# beginnings of multi-key sequences, wait for next key
+		self.prefixes = {keys[:i] for keys in self.actions for i in range(1, len(keys))}
+
+		self.handlers = {
+			'down': self.down,
+			'up': self.up,
+			'step-down': self.step_down,
+			'step-up': self.step_up,
+			'top': self.top,
+			'bottom': self.bottom,
+			'left': lambda window, count: self.align(window, 1),
+			'center': lambda window, count: self.align(window, 0),
+			'right': lambda window, count: self.align(window, 2),
+			'delete': self.delete,
+			'help': self.help,
+			'edit': self.edit,
+			'find': lambda window, count: window.find(),
+			'autoswitchtoggle': self.autoswitch,
+			'next-player': lambda window, count: self.switch(window, count),
+			'prev-player': lambda window, count: self.switch(window, -count)
+		}
+		for name in PROVIDERS:
+			self.handlers[name] = lambda window, count, name=name: self.refresh(window, name)
+
+	def reload(self):
+		''' applies changed keybindings from config file
+			returns True if bindings have changed
+		'''
+		if self.binds.reload():
+			self.compile()
+			return True
+		return False
 
 	def input(self, window, key):
 		if key == curses.KEY_RESIZE:
-			window.update_track()
-		elif key == self.binds['down']:
-			window.scroll_down()
-		elif key == self.binds['step-down']:
-			window.scroll_down(self.binds['step-size'])
-			window.stdscr.erase()
-		elif key == self.binds['up']:
-			window.scroll_up()
-		elif key == self.binds['step-up']:
-			window.scroll_up(self.binds['step-size'])
-			window.stdscr.erase()
-
-		elif key == self.binds['azlyrics']:
-			window.player.refresh(source='azlyrics', cache=False)
-			window.current_pos = 0
-			window.update_track()
-		elif key == self.binds['google']:
-			window.player.refresh(source='google',cache=False)
-			window.current_pos = 0
-			window.update_track()
-			
-		# keys to change alignment
-		elif key == self.binds['left']:
-			window.player.track.alignment=1
-			window.player.track.reset_width()
-			window.update_track()
-		elif key == self.binds['center']:
-			window.player.track.alignment=0
-			window.player.track.reset_width()
-			window.update_track()
-		elif key == self.binds['right']:
-			window.player.track.alignment=2
-			window.player.track.reset_width()
-			window.update_track()
-
-		elif key == self.binds['delete']:
-			if window.player.track.delete_lyrics():
-				window.stdscr.addstr(window.height - 1, 1,
-							' Deleted ', curses.A_REVERSE)
-		elif key == self.binds['help']:
-			window.stdscr.erase()
-			HelpPage(self.binds)
-			window.height, window.width = window.stdscr.getmaxyx()
-		elif key == self.binds['edit']:
-			curses.endwin()
-			window.player.track.edit_lyrics()
-			window.stdscr = curses.initscr()
+			# resizing waits until no resize event came for resize_delay,
+			# main loop shortens its timeout
+			window.resize_at = time.monotonic() + window.resize_delay
+			return
+
+		sequence = self.sequence + (key,)
+		if sequence in self.prefixes:
+			self.sequence = sequence
+			return
+		self.sequence = ()
+
+		action = self.actions.get(sequence)
+		if action is None and len(sequence) > 1:
+			# broken sequence, use last key alone
+			action = self.actions.get((key,))
+
+		if action is None:
+			if ord('0') <= key <= ord('9') and (key != ord('0') or self.count > 0):
+				self.count = self.count * 10 + key - ord('0')
+			else:
+				self.count = 0
+			return
+
+		count = max(self.count, 1)
+		self.count = 0
+
+		if action in self.REPEATABLE:
+			count *= self.coalesce(window, key)
+
+		self.run(window, action, count)
+
+	def run(self, window, action, count=1):
+		handler = self.handlers.get(action)
+		if handler is not None:
+			handler(window, count)
+
+	def coalesce(self, window, key):
+		''' returns number of queued presses of key (held key),
+			so they are handled with a single redraw
+		'''
+		presses = 1
+		window.stdscr.nodelay(True)
+
+		next_key = window.stdscr.getch()
+		while next_key == key:
+			presses += 1
+			next_key = window.stdscr.getch()
+		if next_key != -1:
+			curses.ungetch(next_key)
+
+		# timeout of main loop (fetching, synced line, resize)
+		window.stdscr.timeout(window.input_timeout)
+		return presses
+
+	def down(self, window, count):
+		window.scroll_down(count)
+
+	def up(self, window, count):
+		window.scroll_up(count)
+
+	def step_down(self, window, count):
+		window.scroll_down(self.binds['step-size'] * count)
+		window.stdscr.erase()
+
+	def step_up(self, window, count):
+		window.scroll_up(self.binds['step-size'] * count)
+		window.stdscr.erase()
+
+	def top(self, window, count):
+		window.current_pos = 0
+		window.stdscr.erase()
+
+	def bottom(self, window, count):
+		window.current_pos = max(window.player.track.length - 1, 0)
+		window.stdscr.erase()
+
+	def refresh(self, window, source):
+		window.player.refresh(source=source, cache=False)
+		window.current_pos = 0
+		window.update_track()
+
+	# change alignment
+	def align(self, window, alignment):
+		window.player.set_alignment(alignment)
+		window.update_track()
+
+	def delete(self, window, count):
+		if window.player.track.delete_lyrics():
+			window.stdscr.addstr(window.height - 1, 1,
+						' Deleted ', curses.A_REVERSE)
+
+	def help(self, window, count):
+		window.stdscr.erase()
+		HelpPage(self.binds, window.options)
+		window.height, window.width = window.stdscr.getmaxyx()
+
+	def edit(self, window, count):
+		curses.endwin()
+		window.player.track.edit_lyrics()
+		window.stdscr = curses.initscr()
+		window.current_pos = 0
+		window.player.refresh(cache=True)
+		window.update_track()
+
+	def autoswitch(self, window, count):
+		window.player.autoswitch = not window.player.autoswitch
+		window.stdscr.addstr(window.height - 1, 1,
+		                     f" Autoswitch: {'on' if window.player.autoswitch else 'off'} ", curses.A_REVERSE)
+
+	def switch(self, window, step):
+		# dashboard mode, lyrics of other players are loaded already
+		if window.player.switch(step):
 			window.current_pos = 0
-			window.player.refresh(cache=True)
 			window.update_track()
-		elif key == self.binds['find']:
-			window.find()
-
-		# autoswitch toggle
-		elif key == self.binds['autoswitchtoggle']:
-			window.player.autoswitch = not window.player.autoswitch
 			window.stdscr.addstr(window.height - 1, 1,
-			                     f" Autoswitch: {'on' if window.player.autoswitch else 'off'} ", curses.A_REVERSE)
+			                     f' {window.player.player_name} ', curses.A_REVERSE)
 
 class HelpPage:
-	def __init__(self, keybinds):
+	def __init__(self, keybinds, options):
 		self.keybinds = keybinds
-		self.options = Config('OPTIONS')
+		self.options = options
 
 		self.win = curses.initscr()
 		self.win.box()
@@ -89,9 +204,8 @@ class HelpPage:
 			# set representable strings to ascii values
 			if v in _keys.keys():
 				v = _keys[v]
-			elif k not in ['step-size', 'interval', 'mpd_port']:
-				if isinstance(v, int):
-					v = chr(v) # character values
+			elif k != 'step-size' and isinstance(v, int):
+				v = chr(v) # character values of keybindings
 			self.win.addstr(i, j, f'{k:18} {v}')
 			# self.win.addstr(i, j, f'{k} \t {v}')
 			i += 1
@@ -123,7 +237,18 @@ class HelpPage:
 
 		self.win.addstr(i, j, 'Default Options', curses.A_UNDERLINE)
 		i+= 2
-		self.add_config(i, j, self.options, keys)
+		# options are shown as written in config file
+		i = self.add_config(i, j, self.options.raw, keys)
+
+		memory = get_memory()
+		if memory.stats:
+			i += 1
+			self.win.addstr(i, j, f"{'memory hits/misses':18} {memory.hits}/{memory.misses}")
+
+		for provider in ordered():
+			if provider.attempts > 0:
+				i += 1
+				self.win.addstr(i, j, f'{provider.name:18} {provider.stats()}')
 
 	def main(self):
 		# wait for key input to exit
@@ -140,13 +265,32 @@ class Window:
 		self.stdscr = stdscr
 		self.height, self.width = stdscr.getmaxyx()
 		self.player = player
-		self.scroll_pad = curses.newpad(self.player.track.length + 2,
-					self.player.track.width + 2)
+		# laid out lyrics lines, only visible rows are drawn
+		self.lines = []
 		self.current_pos = 0
 		self.pad_offset = 1
 		self.text_padding = 5
 		self.keys = Key()
 		self.find_position = 0
+		self.timeout = timeout
+		# ms to wait for next key press or player change
+		self.input_timeout = timeout
+		# poll faster while lyrics are fetched in background
+		self.fetch_timeout = min(timeout, 200)
+		# regions to redraw on next render ('title', 'status', 'lyrics')
+		self.dirty = set()
+		self.was_running = None
+		# config file is checked for changes every config_interval seconds
+		self.config_interval = 2
+		self.config_checked = time.monotonic()
+		# (wrap, width) of layout shown
+		self.layout_args = (False, 0)
+		# synced lyrics line at playback position and its laid out rows
+		self.sync_line = None
+		self.sync_rows = range(0)
+		# terminal is re-laid out resize_delay seconds after last resize event
+		self.resize_delay = 0.1
+		self.resize_at = None
 
 		curses.use_default_colors()
 		self.stdscr.timeout(timeout)
@@ -160,9 +304,8 @@ class Window:
 		if self.player.running:
 			self.update_track()
 			self.set_titlebar()
+			self.draw_lyrics()
 			self.stdscr.refresh()
-			self.scroll_pad.refresh(self.current_pos, 0, 4, 
-					self.pad_offset, self.height - 2, self.width - 1)
 		else:
 			self.stdscr.addstr(0, 1, f'{self.player.player_name} is not running!')
 			self.stdscr.refresh()
@@ -176,9 +319,8 @@ class Window:
 		self.stdscr.addstr(2, 1, track_info[2], curses.A_REVERSE)
 
 	def set_statusbar(self):
-		if self.options['statusbar'] == 'on':
-			text = self.player.track.get_text(wrap=True, width=self.width - self.text_padding)
-			lines = text.split('\n')
+		if self.options.getboolean('statusbar'):
+			lines = self.player.track.get_lines(wrap=True, width=self.width - self.text_padding)
 			if self.current_pos < 0:
 				self.current_pos = 0
 			pct_progress = f' {int(self.current_pos * 100 / len(lines)) + 1}% '
@@ -209,7 +351,8 @@ class Window:
 			self.current_pos -= step
 
 	def find_check_keys(self, key=None, lines_map=[]):
-		if key == self.keys.binds['find-next']:
+		action = self.keys.actions.get((key,))
+		if action == 'find-next':
 			self.stdscr.addstr(self.height - 1, self.width - 3, 'n ')
 			self.stdscr.clrtoeol()
 			# reached end of matches, loop back to start
@@ -218,7 +361,7 @@ class Window:
 			else:
 				self.find_position += 1
 			return True
-		elif key == self.keys.binds['find-prev']:
+		elif action == 'find-prev':
 			self.stdscr.addstr(self.height - 1, self.width - 3, 'p ')
 			self.stdscr.clrtoeol()
 			if self.find_position - 1 < 0:
@@ -227,157 +370,324 @@ class Window:
 				self.find_position -= 1
 			return True
 		# other keys for more accessibility
-		elif key == self.keys.binds['down']:
-			self.scroll_down()
-		elif key == self.keys.binds['up']:
-			self.scroll_up()
-		elif key == self.keys.binds['step-down']:
-			self.scroll_down(self.keys.binds['step-size'])
-		elif key == self.keys.binds['step-up']:
-			self.scroll_up(self.keys.binds['step-size'])
-		elif key == self.keys.binds['find']:
-			self.find()
+		elif action in Key.REPEATABLE or action == 'find':
+			self.keys.run(self, action)
 		return False
 
+	def find_draw(self, lines, spans):
+		''' redraws lyrics at current position, highlights matched spans of current line
+		'''
+		self.stdscr.erase()
+		self.set_titlebar()
+		self.draw_lyrics()
+
+		# one addstr per match instead of redrawing the line char by char
+		line_text = lines[self.current_pos] if self.current_pos < len(lines) else ''
+		for start, end in spans:
+			if self.pad_offset + end < self.width:
+				self.stdscr.addstr(4, self.pad_offset + start, line_text[start:end], curses.A_REVERSE)
+
+	def find_position_from(self, lines_map, pos):
+		''' returns index of first match at or after pos, loops back to start
+		'''
+		for i, line in enumerate(lines_map):
+			# >= causes us to stay on the current line for a new search
+			if line >= pos:
+				return i
+		return 0
+
+	def find_prompt(self, find_string, regex, word):
+		''' returns prompt of find input with active modes, r -> regex, w -> whole word
+		'''
+		modes = ('r' if regex else '') + ('w' if word else '')
+		return f'{modes}:{find_string}'
+
+	def find_input(self, index, lines):
+		''' reads find string, matches are shown while typing
+			ctrl-r toggles regex, ctrl-w toggles whole word matching
+			returns (find string, regex, word, matches), find string is empty if cancelled
+		'''
+		start_pos = self.current_pos
+		find_string = ''
+		regex = word = False
+		matches = []
+
+		while True:
+			lines_map = [line for line, _ in matches]
+			if matches:
+				self.find_position = self.find_position_from(lines_map, start_pos)
+				self.current_pos = lines_map[self.find_position]
+				spans = matches[self.find_position][1]
+			else:
+				self.current_pos = start_pos
+				spans = []
+			self.find_draw(lines, spans)
+
+			prompt = self.find_prompt(find_string, regex, word)[:self.width - self.pad_offset - 1]
+			self.stdscr.addstr(self.height - 1, self.pad_offset, prompt)
+			if find_string and not matches:
+				output = ' not found '
+				if self.pad_offset + len(prompt) + len(output) + 1 < self.width:
+					self.stdscr.addstr(self.height - 1, self.pad_offset + len(prompt) + 1, output, curses.A_REVERSE)
+			self.stdscr.move(self.height - 1, self.pad_offset + len(prompt))
+
+			try:
+				key = self.stdscr.get_wch()
+			except curses.error:
+				continue
+
+			if key in ('\n', '\r', curses.KEY_ENTER):
+				return find_string, regex, word, matches
+			elif key == '\x1b':
+				self.current_pos = start_pos
+				return '', regex, word, []
+			elif key in ('\x7f', '\b', curses.KEY_BACKSPACE):
+				find_string = find_string[:-1]
+			elif key == '\x12':
+				regex = not regex
+			elif key == '\x17':
+				word = not word
+			elif key == curses.KEY_RESIZE:
+				self.height, self.width = self.stdscr.getmaxyx()
+				continue
+			elif isinstance(key, str) and key.isprintable():
+				find_string += key
+			else:
+				continue
+
+			matches = index.search(find_string.strip(), regex, word)
+
 	def find(self):
 		# wait for input
 		self.stdscr.timeout(-1)
-		prompt = ':'
-		self.stdscr.move(self.height - 1, 0)
-		self.stdscr.clrtoeol()
-		self.stdscr.addstr(self.height - 1, self.pad_offset, prompt)
-		self.set_statusbar()
-		# show cursor and key presses during find
-		curses.echo()
+		# show cursor during find
 		curses.curs_set(1)
 
-		# (y, x, input max length), case-insensitive
-		find_string = self.stdscr.getstr(self.height - 1, len(prompt)+self.pad_offset, 100).decode(encoding="utf-8").strip()
+		# use word wrap which covers both wrap/nowrap and ensures line count is accurate
+		width = self.width - self.text_padding
+		lines = self.player.track.get_lines(wrap=True, width=width)
+		index = self.player.track.get_search_index(wrap=True, width=width)
 
-		# hide cursor and key presses
-		curses.curs_set(0)
-		curses.noecho()
+		find_string, regex, word, matches = self.find_input(index, lines)
 
-		if find_string:
-			# use word wrap which covers both wrap/nowrap and ensures line count is accurate
-			text = self.player.track.get_text(wrap=True, width=self.width - self.text_padding)
-			lines = text.split('\n')
+		# hide cursor
+		curses.curs_set(0)
 
+		if find_string.strip() and matches:
 			# [0,9,10,14] list of lines that contain a match
-			lines_map = []
-			for line_num, line in enumerate(lines):
-				# case-insensitive match
-				if find_string.lower() in line.lower():
-					lines_map.append(line_num)
-
-			if len(lines_map) > 0:
-
-				# continue search from current position
-				for line in lines_map:
-					# >= causes us to stay on the current line for a new search
-					if line >= self.current_pos:
-						self.find_position = lines_map.index(line)
-						break
-				# otherwise loop back to the start
-				else:
-					self.find_position = 0
-
-				while True:
-					# update current position based on where we are at in the find
-					self.current_pos = lines_map[self.find_position]
-
-					# duplicated from main() to manually refresh on find
-					self.stdscr.clear()
-					self.set_titlebar()
-					self.stdscr.refresh()
-					self.scroll_pad.refresh(self.current_pos, 0, 4, self.pad_offset, self.height - 2, self.width - 1)
-
-					# find & status bar output
-					find_string_output = f' {find_string} '
-					find_count_output = f" {self.find_position + 1}/{len(lines_map)} "
-					self.stdscr.addstr(self.height - 1, self.pad_offset, find_string_output, curses.A_REVERSE)
-					self.stdscr.insstr(self.height - 1, self.pad_offset + len(find_string_output) + 1, find_count_output)
-					# multiple matches, show next/prev
-					if len(lines_map) > 1:
-						help_output = f"[{chr(self.keys.binds['find-next'])}]=next, [{chr(self.keys.binds['find-prev'])}]=prev"
-						self.stdscr.addstr(self.height - 1, self.pad_offset + len(find_string_output) + len(find_count_output) + 2, help_output)
-					self.set_statusbar()
-
-					# highlight found text
-					line_text = lines[self.current_pos]
-					# case-insensitive, [4, 5, 21]
-					found_index_list = [i for i in range(len(line_text)) if line_text.lower().startswith(find_string.lower(), i)]
-					# loop over each character in the line, highlight found strings
-					highlight_end = -1
-					for cpos, char in enumerate(line_text):
-						attr = curses.A_NORMAL
-						# start of found string
-						if cpos in found_index_list:
-							highlight_end = cpos + len(find_string)
-							attr = curses.A_REVERSE
-						# inside string
-						elif highlight_end > cpos:
-							attr = curses.A_REVERSE
-						self.stdscr.addch(4, self.pad_offset + cpos, char, attr)
-
-					# after finding a match in a line, stop, wait for input
-					self.stdscr.timeout(10000)
-					key = self.stdscr.getch()
-					result = self.find_check_keys(key, lines_map)
-					if not result:
-						break
-
-			else:
-				output = ' not found '
-				self.stdscr.insstr(self.height - 1, self.pad_offset + len(prompt) + len(find_string) + 2, output, curses.A_REVERSE)
+			lines_map = [line for line, _ in matches]
+			find_string_output = f' {self.find_prompt(find_string.strip(), regex, word)} '
+
+			while True:
+				# update current position based on where we are at in the find
+				self.current_pos = lines_map[self.find_position]
+				self.find_draw(lines, matches[self.find_position][1])
+
+				# find & status bar output
+				find_count_output = f" {self.find_position + 1}/{len(lines_map)} "
+				self.stdscr.addstr(self.height - 1, self.pad_offset, find_string_output, curses.A_REVERSE)
+				self.stdscr.insstr(self.height - 1, self.pad_offset + len(find_string_output) + 1, find_count_output)
+				# multiple matches, show next/prev
+				if len(lines_map) > 1:
+					help_output = f"[{chr(self.keys.binds['find-next'])}]=next, [{chr(self.keys.binds['find-prev'])}]=prev"
+					self.stdscr.addstr(self.height - 1, self.pad_offset + len(find_string_output) + len(find_count_output) + 2, help_output)
 				self.set_statusbar()
-				# timeout or key press
-				self.stdscr.timeout(5000)
+
+				# after finding a match in a line, stop, wait for input
+				self.stdscr.timeout(10000)
 				key = self.stdscr.getch()
-				self.find_check_keys(key, lines_map)
+				result = self.find_check_keys(key, lines_map)
+				if not result:
+					break
+
+		elif find_string.strip():
+			self.set_statusbar()
+			# timeout or key press
+			self.stdscr.timeout(5000)
+			key = self.stdscr.getch()
+			self.find_check_keys(key, [])
 
 		# clear search line
 		self.stdscr.clear()
 
+	def sync_lyrics(self):
+		''' scrolls to and highlights synced lyrics line at playback position
+			returns seconds until next line, None if lyrics are not followed
+		'''
+		track = self.player.track
+		if not (track.synced and self.player.running and self.options.getboolean('sync')):
+			return None
+
+		position = self.player.position()
+		if position is None:
+			return None
+
+		line = track.line_at(position)
+		if line != self.sync_line:
+			self.sync_line = line
+			self.sync_rows = track.get_rows(line, *self.layout_args) if line >= 0 else range(0)
+
+			if len(self.sync_rows) > 0:
+				# keep current line in upper third of lyrics view
+				self.current_pos = max(0, self.sync_rows[0] - (self.height - 6) // 3)
+			self.mark_dirty('lyrics', 'status')
+
+		next_time = track.next_time(position)
+		if next_time is None or not self.player.playing:
+			return None
+		return next_time - position
+
+	def reload_config(self):
+		''' applies changes in config file without restart
+		'''
+		now = time.monotonic()
+		if now - self.config_checked < self.config_interval:
+			return
+		self.config_checked = now
+
+		if self.options.reload():
+			self.timeout = self.options['interval']
+			self.fetch_timeout = min(self.timeout, 200)
+			self.player.default_source = self.options['source']
+			self.mark_dirty()
+
+		if self.keys.reload():
+			self.mark_dirty()
+
+	def mark_dirty(self, *regions):
+		''' marks regions to be redrawn, all regions if none given
+		'''
+		self.dirty.update(regions or ('title', 'status', 'lyrics'))
+
+	def render(self):
+		''' redraws dirty regions only, screen is updated once with doupdate
+		'''
+		if not self.dirty:
+			return
+
+		if self.player.running:
+			if 'title' in self.dirty:
+				self.set_titlebar()
+			if 'lyrics' in self.dirty:
+				self.draw_lyrics()
+			if 'status' in self.dirty:
+				self.set_statusbar()
+			self.stdscr.noutrefresh()
+		else:
+			self.stdscr.clear()
+			self.stdscr.addstr(0, 1, f'{self.player.player_name} player is not running.')
+			self.stdscr.noutrefresh()
+
+		curses.doupdate()
+		self.dirty.clear()
+
 	def update_track(self):
 		self.stdscr.clear()
-		self.scroll_pad.clear()
+		self.mark_dirty()
 
 		if self.player.track.width > self.width - self.text_padding:
-			text = self.player.track.get_text(wrap=True, 
-						width=self.width - self.text_padding)
+			self.layout_args = (True, self.width - self.text_padding)
 		else:
-			text = self.player.track.get_text()
+			self.layout_args = (False, 0)
+		self.lines = self.player.track.get_lines(*self.layout_args)
+		# rows of synced line are looked up again in new layout
+		self.sync_line = None
+		self.sync_rows = range(0)
+		self.set_offset()
+
+	def resize(self):
+		''' lays lyrics out for new terminal size,
+			keeps lyrics line at top of view in place
+		'''
+		self.resize_at = None
+		self.height, self.width = self.stdscr.getmaxyx()
+		self.mark_dirty()
+
+		track = self.player.track
+		if track.lyrics is None:
+			return
+
+		line = track.get_line(self.current_pos, *self.layout_args)
+		track.reset_width()
+		self.update_track()
+		self.current_pos = track.get_rows(line, *self.layout_args)[0]
+
+	def draw_lyrics(self):
+		''' draws visible rows of lyrics (4 to height - 2) from current position,
+			cost depends on screen size, not on length of lyrics
+		'''
+		width = self.width - self.pad_offset
+		for row in range(4, self.height - 1):
+			self.stdscr.move(row, 0)
+			self.stdscr.clrtoeol()
 
-		pad_height = max(self.height, self.player.track.length) + 2
-		pad_width = max(self.width, self.player.track.width) + 2
+			line_num = self.current_pos + row - 4
+			if line_num < len(self.lines) and width > 0:
+				attr = curses.A_BOLD if line_num in self.sync_rows else curses.A_NORMAL
+				self.stdscr.addnstr(row, self.pad_offset, self.lines[line_num], width, attr)
+
+	def wait_input(self):
+		''' returns next key, -1 on timeout or when player may have changed
+			dbus signals and mpd idle replies wake up right away
+		'''
+		fds = self.player.fds()
+		if not fds:
+			return self.stdscr.getch()
+
+		# keys buffered by curses are not seen by select
+		self.stdscr.timeout(0)
+		key = self.stdscr.getch()
+		self.stdscr.timeout(self.input_timeout)
+		if key != -1:
+			return key
+
+		readable, _, _ = select([sys.stdin] + fds, [], [], self.input_timeout / 1000)
+		if sys.stdin in readable:
+			return self.stdscr.getch()
+		return -1
 
-		self.scroll_pad.resize(pad_height, pad_width)
-		self.scroll_pad.addstr(text)
-		self.set_offset()	
-		
 	def main(self):
 		key = ''
 
 		while key != self.keys.binds['quit']:
-			key = self.stdscr.getch()
+			key = self.wait_input()
 
 			self.height, self.width = self.stdscr.getmaxyx()
 
 			if key == -1:
+				self.reload_config()
+
 				if self.player.update():
 					self.current_pos = 0
 					self.update_track()
-					
-			if self.player.running:
+
+			if self.player.check_lyrics():
+				self.current_pos = 0
+				self.update_track()
+
+			if self.resize_at is not None and time.monotonic() >= self.resize_at:
+				self.resize()
+
+			timeout = self.fetch_timeout if self.player.fetching else self.timeout
+			wait = self.sync_lyrics()
+			if wait is not None:
+				# wake up when next synced line starts
+				timeout = min(timeout, max(int(wait * 1000) + 10, 50))
+
+			if self.player.running != self.was_running:
+				self.was_running = self.player.running
+				self.mark_dirty()
+
+			if self.player.running and key != -1:
 				self.keys.input(self, key)
+				# keys may draw anywhere (help page, find, messages)
+				self.mark_dirty()
 
-				self.set_titlebar()
-				self.set_statusbar()
-				self.stdscr.refresh()
-				self.scroll_pad.refresh(self.current_pos, 0, 4, 
-							self.pad_offset, self.height - 2, self.width - 1)
-			else:
-				self.stdscr.clear()
-				self.stdscr.addstr(0, 1, f'{self.player.player_name} player is not running.')
-				self.stdscr.refresh()
+			# after keys, resize may have just started
+			if self.resize_at is not None:
+				timeout = min(timeout, int(self.resize_delay * 1000))
+			self.input_timeout = timeout
+			self.stdscr.timeout(timeout)
+
+			if self.resize_at is None:
+				self.render()
@@ -74,7 +74,8 @@ setup(
     ],
     extras_require={
         'mpd': ['python-mpd2'],
-        'full': ['python-mpd2']
+        'batch': ['mutagen'],
+        'full': ['python-mpd2', 'mutagen']
     },
     python_requires='>=3.6',
     cmdclass={